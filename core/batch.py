@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import time
+from typing import List, Set
+
+from core.service import AgentService
+from infrastructure.stats_util import percentile
+
+
+def read_requests(input_path: str) -> List[dict]:
+    """Queries from a JSONL file; lines without an "id" get a stable one from their line number."""
+    requests = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            request.setdefault("id", f"line-{line_number}")
+            requests.append(request)
+    return requests
+
+
+def succeeded(result: dict) -> bool:
+    return result.get("status") == "ok"
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """
+    IDs answered successfully in a previous (possibly crashed) run. Lines with status "error" and
+    truncated lines are redone; a later success for the same id counts.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue # Last line cut off by the crash
+            if succeeded(result):
+                done.add(result["id"])
+    return done
+
+
+async def run_batch(service: AgentService, input_path: str, output_path: str, workers: int = 4) -> dict:
+    """
+    Route + execute every query of input_path with `workers` concurrent executions sharing the
+    service's RAGStorage/LLMClient/MCPService. Each result is appended to output_path as soon as it
+    is done, so re-running the same command resumes where a crash stopped it.
+    """
+    requests = read_requests(input_path)
+    done = completed_ids(output_path)
+    pending = [request for request in requests if request["id"] not in done]
+    print(f"--- [Batch] {len(requests)} queries, {len(requests) - len(pending)} already done, "
+          f"{len(pending)} to run with {workers} workers ---")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for request in pending:
+        queue.put_nowait(request)
+    results = []
+
+    async def _worker(out):
+        while True:
+            try:
+                request = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await service.handle(request)
+            # Single event loop thread: one write per line, never interleaved
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            results.append(result)
+
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        await asyncio.gather(*(_worker(out) for _ in range(max(workers, 1))))
+    wall_seconds = time.perf_counter() - start
+    return summarize(results, wall_seconds, skipped=len(requests) - len(pending))
+
+
+def summarize(results: List[dict], wall_seconds: float, skipped: int = 0) -> dict:
+    successes = [result for result in results if succeeded(result)]
+    stages = {"total": [result["latency_ms"] for result in successes]}
+    for result in successes:
+        for stage, ms in result.get("timings_ms", {}).items():
+            stages.setdefault(stage, []).append(ms)
+    return {
+        "completed": len(successes),
+        "failed": len(results) - len(successes),
+        "skipped": skipped,
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_qps": round(len(results) / wall_seconds, 3) if wall_seconds else 0.0,
+        "stages_ms": {stage: {"p50": percentile(values, 50), "p95": percentile(values, 95),
+                              "mean": round(sum(values) / len(values), 1)}
+                      for stage, values in stages.items() if values},
+    }
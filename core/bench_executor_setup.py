@@ -0,0 +1,63 @@
+"""
+Per-query setup overhead of TaskExecutor (no LLM/RAG/browser work is timed).
+
+- before: a new TaskExecutor per query (ToolNode + StateGraph compile) and ChatOpenAI.bind_tools() on
+          every agent step, which is what main.py used to do
+- after:  one shared TaskExecutor and the tool-bound model cached in LLMClient (the cache key still
+          serializes the tool schemas on every step, so that cost is included)
+
+A real ChatOpenAI is used so bind_tools() does its actual schema conversion; binding sends nothing,
+so no API key or network is needed.
+
+Usage: python -m core.bench_executor_setup --queries 200 --agent-steps 3
+"""
+import argparse
+import os
+import time
+
+from core.executor import TaskExecutor
+from core.llm_client import LLMClient
+from infrastructure.stats_util import percentile
+from services.mcp_service import MCPService
+
+
+def _report(label: str, samples_ms):
+    print(f"{label}: p50 {percentile(samples_ms, 50):.3f} ms, p95 {percentile(samples_ms, 95):.3f} ms, "
+          f"total {sum(samples_ms):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--agent-steps", type=int, default=3, help="bind_tools calls per query (agent loop)")
+    args = parser.parse_args()
+
+    # ChatOpenAI refuses to construct without a key; nothing is sent, only objects are built
+    os.environ.setdefault("OPENAI_API_KEY", "bench-no-network")
+    llm_client = LLMClient(model_name="gpt-4o", cache=False)
+    mcp_service = MCPService()
+    prompts = {}
+
+    before = []
+    for _ in range(args.queries):
+        start = time.perf_counter()
+        executor = TaskExecutor(llm_client, prompts, mcp_service, rag_storage=None)
+        for _ in range(args.agent_steps):
+            llm_client.llm.bind_tools(executor.tools)
+        before.append((time.perf_counter() - start) * 1000)
+
+    shared = TaskExecutor(llm_client, prompts, mcp_service, rag_storage=None)
+    after = []
+    for _ in range(args.queries):
+        start = time.perf_counter()
+        for _ in range(args.agent_steps):
+            llm_client.bind_tools(shared.tools)
+        after.append((time.perf_counter() - start) * 1000)
+
+    _report("Before (executor per query)", before)
+    _report("After (shared executor)", after)
+    print(f"Saved per query: {(sum(before) - sum(after)) / args.queries:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
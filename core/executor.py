@@ -1,4 +1,3 @@
-import asyncio
 from langchain_ollama import ChatOllama
 from langchain_core.tools import Tool
 from langchain_core.prompts import PromptTemplate
@@ -8,13 +7,18 @@ from langchain_classic.agents.output_parsers import ReActSingleInputOutputParser
 
 from core.llm_client import LLMClient
 from infrastructure.database import RAGStorage
+from infrastructure.metadata_filter import build_where_filter
 from services.mcp_service import MCPService
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
 from typing import Annotated, List, TypedDict, Union
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage, AIMessage, AIMessageChunk
 from langgraph.graph.message import add_messages
 
+AUTO_CONTEXT_FILTER = build_where_filter(sections=["test_steps", "ui_elements"])
+# Nodes whose messages are the answer shown to the user (tool results / rethink notes are not)
+ANSWER_NODES = ("agent", "manual_gen")
+
 #Define State Structure
 class AgentState(TypedDict):
     # 'add_messages' help append chat history so that AI can remember last steps
@@ -23,7 +27,12 @@ class AgentState(TypedDict):
     tool_trigger_count: int
 
 class TaskExecutor:
-    def __init__(self, llm_client:LLMClient, all_prompts:dict, mcp_service:MCPService, rag_storage:RAGStorage, routing_info):
+    def __init__(self, llm_client:LLMClient, all_prompts:dict, mcp_service:MCPService, rag_storage:RAGStorage, routing_info=None):
+        """
+        Build once per process and reuse for every query: the ToolNode and the compiled graph are
+        created here only. Per-request data (messages, category, counters) lives in the graph state,
+        so concurrent execute() calls on one instance do not interfere. routing_info is unused (legacy).
+        """
         # self.llm = ChatOllama(
         #     model="llama3.2:3b", 
         #     temperature=0
@@ -38,7 +47,6 @@ class TaskExecutor:
         self.tool_node = ToolNode(self.tools)
         self.workflow = self._create_workflow()
         self.app = self.workflow.compile()
-        self.category = routing_info["category"]
 
     def _check_category(self, state: AgentState):
     # state is passed by LangGraph automatically
@@ -111,9 +119,20 @@ class TaskExecutor:
         """Using manual/general prompt"""
         query = state["messages"][-1].content
         category = state["category"].lower() # manual or general
-        context = self.rag_store.search_documents(query)
+        # Paraphrases of an already answered question skip both RAG search and the LLM call
+        corpus_version = self.rag_store.corpus_version
+        query_vector = await self.rag_store.aembed_query(query)
+        cached = self.rag_store.semantic_cache.lookup(query_vector, category, corpus_version)
+        if cached is not None:
+            return {"messages": [HumanMessage(content=cached)]}
+
+        hits = await self.rag_store.asearch_documents(query)
+        context = self.rag_store.build_context(hits)
         prompt = self.prompts[category].format(context=context, query=query)
-        response = await self.llm.call_ai(prompt)
+        # Tokens surface through the graph's "messages" stream while the answer is assembled here.
+        # A failed stream raises, so only complete answers reach the semantic cache
+        response = "".join([token async for token in self.llm.stream_ai(prompt)])
+        self.rag_store.semantic_cache.store(query, query_vector, category, response, corpus_version)
         return {"messages": [HumanMessage(content=response)]}
     
     def _should_continue(self, state: AgentState):
@@ -145,7 +164,15 @@ class TaskExecutor:
         # Inject RAG context to the first message if required
         if len(messages) == 1:
             query = messages[-1].content
-            rag_context = self.rag_store.search_documents(query)
+            # AUTO only needs the "how" of a test case: steps + UI elements/locators
+            context_filter = AUTO_CONTEXT_FILTER
+            hits = await self.rag_store.asearch_documents(query, where=context_filter)
+            if not hits:
+                # Corpus without section metadata (e.g. plain markdown) -> unfiltered search
+                context_filter = None
+                hits = await self.rag_store.asearch_documents(query)
+            # Winning test case(s) rendered compactly, expanded only within the sections AUTO asked for
+            rag_context = self.rag_store.build_context(hits, where=context_filter)
             # Create System Message to guide Agentic Flow
             combined_prompt = f"{self.prompts['auto']}\n\n{self.prompts['agent_system_message']}"
             system_content = combined_prompt.format(
@@ -156,39 +183,77 @@ class TaskExecutor:
             # system_msg = SystemMessage(content=f"{self.prompts['agent_system_message']}\nContext: {rag_context}")
             # messages = [system_msg] + messages
 
-        # Call LLM's support to call tools
-        await asyncio.sleep(1.5)
-        response = await self.llm.llm.bind_tools(self.tools).ainvoke(messages)
+        # Call LLM's support to call tools (throttled by the shared rate limiter in LLMClient)
+        response = await self.llm.call_with_tools(messages, self.tools)
         print(f"--- [AI Thought]: {response.content} ---") # CHeck if AI still want to call next tool
         print(f"--- [Tool Calls]: {response.tool_calls} ---")
         return {"messages": [response]}
 
+    async def stream(self, query: str, routing_info: dict):
+        """
+        Run the graph and yield events as they happen:
+        - {"type": "token", "node": .., "content": ..}: answer text, token by token while the LLM generates
+        - {"type": "node", "node": .., "output": ..}: a node finished (same as the old per-node updates)
+        - {"type": "final", "content": ..}: the assembled final answer
+        Cached responses produce no tokens; their whole message is yielded as a single token event.
+        """
+        initial_state = {
+            "messages": [HumanMessage(content=query)],
+            "category": routing_info["category"]
+        }
+        streamed_steps = set()
+        final_answer = None
+        async for mode, payload in self.app.astream(
+                initial_state, config={"recursion_limit": 15}, stream_mode=["messages", "updates"]):
+            if mode == "messages":
+                message, metadata = payload
+                node = metadata.get("langgraph_node")
+                if node not in ANSWER_NODES or not isinstance(message.content, str) or not message.content:
+                    continue
+                if isinstance(message, AIMessageChunk):
+                    streamed_steps.add(metadata.get("langgraph_step"))
+                elif metadata.get("langgraph_step") in streamed_steps:
+                    # Whole message of a step whose tokens were already streamed
+                    continue
+                yield {"type": "token", "node": node, "content": message.content}
+            else:
+                for node_name, output in payload.items():
+                    if node_name in ANSWER_NODES and output and output.get("messages"):
+                        final_answer = output["messages"][-1].content
+                    yield {"type": "node", "node": node_name, "output": output}
+        yield {"type": "final", "content": final_answer}
+
     async def execute(self, query: str, routing_info: dict):
+        """
+        RAG Chain process:
+        1. Get category and selected tools from Router
+        2. Invoke data from RAGStore
+        3. Combine into Prompt and call LLM
+        Tokens are printed as they are generated; the assembled final answer is returned.
+        A failure (LLM, RAG or tool error) is raised, never returned as an answer.
+        """
         try:
-            """
-            RAG Chain process: 
-            1. Get category and selected tools from Router
-            2. Invoke data from RAGStore
-            3. Combine into Prompt and call LLM
-            """
-            initial_state = {
-                "messages": [HumanMessage(content=query)],
-                "category": routing_info["category"]
-            }
-            async for event in self.app.astream(initial_state, config={"recursion_limit": 15}):
-                for node_name, output in event.items():
-                    print(f"\n[MANAGER]: Node '{node_name}' finished execution.")
+            final_answer = None
+            async for event in self.stream(query, routing_info):
+                if event["type"] == "token":
+                    print(event["content"], end="", flush=True)
+                elif event["type"] == "node":
+                    print(f"\n[MANAGER]: Node '{event['node']}' finished execution.")
                     # Print AI message or Tool's result
-                    if "messages" in output:
+                    output = event["output"]
+                    if output and "messages" in output:
                         last_msg = output["messages"][-1]
                         print(f"Content: {last_msg.content}...")
-            
-        except Exception as e:
+                else:
+                    final_answer = event["content"]
+            return final_answer
+
+        except Exception:
             import traceback
             traceback.print_exc()
-            return f"❌ Error during executing Agent: {str(e)}"
+            raise
 
         finally:
-            if self.mcp_service and hasattr(self.mcp_service, 'web_automation_service'):
-                await self.mcp_service.web_automation_service.cleanup()
-                print("Ending...")
+            # The session's browser context stays leased for its follow-up requests; the caller releases
+            # it (web_automation_service.close_session) or the pool reaps it when idle
+            print("Ending...")
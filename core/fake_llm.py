@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+
+# Used when no script file is given: routes by the router keywords, calls the scan tool once, then answers
+DEFAULT_SCRIPT = [
+    {"structured": {"category": "AUTO", "tools": [{"name": "mcp_scan_web_tool", "args": {}}]},
+     "match": r"(?i)classify:[^\n]*(playwright|script|code|automation|url)"},
+    {"structured": {"category": "GENERAL", "tools": []}},
+    {"role": "human", "match": r"(?i)playwright|script|automation",
+     "content": "I need the selectors of the current page first.",
+     "tool_calls": [{"name": "mcp_scan_web_tool", "args": {}}]},
+    {"role": "tool", "content": "Final Answer:\n```typescript\n// scripted response\n```"},
+    {"content": "This is a scripted response."},
+]
+
+
+def to_script_entry(message: AIMessage, match: Optional[str] = None, role: Optional[str] = None) -> dict:
+    """Convert a recorded AIMessage into a script entry (one JSONL line) for ScriptedChatModel."""
+    entry = {"content": message.content}
+    if message.tool_calls:
+        entry["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in message.tool_calls]
+    if match:
+        entry["match"] = match
+    if role:
+        entry["role"] = role
+    return entry
+
+
+class ScriptRecorder:
+    """
+    Appends every live model response to a JSONL script, in call order. Entries have no match/role,
+    so ScriptedChatModel.from_file() replays them sequentially (chat and structured calls separately).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, result: Any):
+        if isinstance(result, AIMessage):
+            entry = to_script_entry(result)
+        else:
+            # with_structured_output() result: pydantic model or dict
+            entry = {"structured": result.model_dump() if hasattr(result, "model_dump") else result}
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic offline chat model for load tests and benchmarks (no network).
+
+    Each script entry may contain:
+    - "match": regex searched in the last message content
+    - "role":  type of the last message ("human", "system", "tool", "ai")
+    - "content" / "tool_calls": the AIMessage to return for chat calls
+    - "structured": the dict returned by with_structured_output()
+    The first entry whose match/role conditions hold is returned. Entries with neither condition are
+    replayed in order (cycling), which reproduces a recorded conversation.
+
+    latency: {"distribution": "fixed", "ms": 200} | {"distribution": "uniform", "min_ms": .., "max_ms": ..}
+             | {"distribution": "lognormal", "median_ms": .., "sigma": ..}
+    """
+    script: List[dict] = DEFAULT_SCRIPT
+    latency: dict = {"distribution": "fixed", "ms": 0}
+    seed: int = 0
+
+    _rng: Any = PrivateAttr(default=None)
+    _cursors: dict = PrivateAttr(default_factory=dict)
+    _call_ids: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        super().model_post_init(__context)
+        self._rng = random.Random(self.seed)
+        self._call_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ScriptedChatModel":
+        """Load a script from a JSON list or a JSONL file (one entry per line)."""
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        if text.lstrip().startswith("["):
+            script = json.loads(text)
+        else:
+            script = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return cls(script=script, **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def _sample_latency(self) -> float:
+        distribution = self.latency.get("distribution", "fixed")
+        with self._lock:
+            if distribution == "uniform":
+                ms = self._rng.uniform(self.latency.get("min_ms", 0), self.latency.get("max_ms", 0))
+            elif distribution == "lognormal":
+                ms = self._rng.lognormvariate(
+                    math.log(max(self.latency.get("median_ms", 1), 1e-3)), self.latency.get("sigma", 0.5))
+            else:
+                ms = self.latency.get("ms", 0)
+        return ms / 1000
+
+    def _select(self, messages: List[BaseMessage], kind: str) -> dict:
+        last = messages[-1] if messages else HumanMessage(content="")
+        text = last.content if isinstance(last.content, str) else json.dumps(last.content)
+        candidates = [entry for entry in self.script if ("structured" in entry) == (kind == "structured")]
+        if not candidates:
+            raise ValueError(f"Script has no entry for {kind} calls")
+
+        sequential = []
+        for entry in candidates:
+            if "match" not in entry and "role" not in entry:
+                sequential.append(entry)
+                continue
+            if "role" in entry and entry["role"] != last.type:
+                continue
+            if "match" in entry and not re.search(entry["match"], text):
+                continue
+            return entry
+        if not sequential:
+            raise ValueError(f"No script entry matches the last {last.type} message: {text[:80]}")
+        with self._lock:
+            cursor = self._cursors.get(kind, 0)
+            self._cursors[kind] = cursor + 1
+        return sequential[cursor % len(sequential)]
+
+    def _to_message(self, entry: dict) -> AIMessage:
+        tool_calls = [
+            {"name": call["name"], "args": call.get("args", {}), "id": f"call_fake_{next(self._call_ids)}"}
+            for call in entry.get("tool_calls", [])
+        ]
+        return AIMessage(content=entry.get("content", ""), tool_calls=tool_calls)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._sample_latency())
+        return ChatResult(generations=[ChatGeneration(message=self._to_message(self._select(messages, "chat")))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._sample_latency())
+        return ChatResult(generations=[ChatGeneration(message=self._to_message(self._select(messages, "chat")))])
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs):
+        # Word-sized chunks with the sampled latency spread over them, so time-to-first-token is measurable
+        message = self._to_message(self._select(messages, "chat"))
+        tokens = re.findall(r"\s*\S+", message.content) or [""]
+        delay = self._sample_latency() / len(tokens)
+        for token in tokens:
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                for index, call in enumerate(message.tool_calls)]))
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool calls come from the script, the schemas are not needed
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        def _structured(entry: dict):
+            data = entry["structured"]
+            if isinstance(schema, type) and hasattr(schema, "model_validate"):
+                return schema.model_validate(data)
+            return data
+
+        def _as_messages(model_input) -> List[BaseMessage]:
+            if isinstance(model_input, list):
+                return model_input
+            return [HumanMessage(content=str(model_input))]
+
+        def _invoke(model_input):
+            time.sleep(self._sample_latency())
+            return _structured(self._select(_as_messages(model_input), "structured"))
+
+        async def _ainvoke(model_input):
+            await asyncio.sleep(self._sample_latency())
+            return _structured(self._select(_as_messages(model_input), "structured"))
+
+        return RunnableLambda(_invoke, afunc=_ainvoke)
@@ -0,0 +1,171 @@
+"""
+Fast path in front of the LLM router.
+
+Calibrate the centroid thresholds on labelled queries ({"query": .., "category": ..} per line):
+    python -m core.fast_router --calibrate labelled_queries.jsonl --precision 0.95
+and copy the printed min_similarity / min_margin into `router_rules.centroid` of prompts/agent_prompt.yaml.
+"""
+import argparse
+import asyncio
+import json
+import math
+import re
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+
+def _normalize(vector) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+
+class FastPathClassifier:
+    """
+    Local classifier in front of the LLM router, configured by the `router_rules` section of
+    prompts/agent_prompt.yaml.
+
+    1. Keyword/regex rules, checked per category in config order (first match wins): microseconds.
+       Put the specific categories first; a rule for small talk should be anchored to the whole query.
+    2. Optional nearest-centroid model over the MiniLM query embeddings of a few example queries per
+       category; only decides when the best centroid is similar enough and clearly ahead of the runner-up.
+       Its thresholds come from calibrate() on labelled queries.
+    Returns None when neither is confident, so the caller falls back to the LLM.
+    """
+
+    def __init__(self, rules: dict):
+        self.min_confidence = rules.get("min_confidence", 0.8)
+        self._rules: List[Tuple[str, re.Pattern, float]] = []
+        for category, config in rules.get("categories", {}).items():
+            alternatives = [r"\b" + re.escape(keyword) + r"\b" for keyword in config.get("keywords", [])]
+            alternatives += config.get("patterns", [])
+            if alternatives:
+                self._rules.append((category, re.compile("|".join(alternatives), re.IGNORECASE),
+                                    config.get("confidence", 0.9)))
+
+        centroid = rules.get("centroid") or {}
+        self.centroid_enabled = bool(centroid.get("enabled") and centroid.get("examples"))
+        self.min_similarity = centroid.get("min_similarity", 0.55)
+        self.min_margin = centroid.get("min_margin", 0.08)
+        self._examples = centroid.get("examples", {})
+        self._centroids = None
+        self._centroid_lock = asyncio.Lock()
+
+    def classify_rules(self, query: str) -> Optional[Tuple[str, float]]:
+        for category, pattern, confidence in self._rules:
+            if pattern.search(query):
+                return category, confidence
+        return None
+
+    async def _ensure_centroids(self, embed: Callable[[str], Awaitable[list]]):
+        if self._centroids is not None:
+            return
+        # Concurrent first queries would otherwise all embed the examples
+        async with self._centroid_lock:
+            if self._centroids is None:
+                centroids = {}
+                for category, examples in self._examples.items():
+                    vectors = [_normalize(await embed(example)) for example in examples]
+                    centroids[category] = _normalize([sum(values) / len(vectors) for values in zip(*vectors)])
+                self._centroids = centroids
+
+    def _score(self, query_vector) -> Optional[Tuple[str, float, float]]:
+        """(best category, its similarity, margin over the runner-up)."""
+        query_vector = _normalize(query_vector)
+        scores = sorted(
+            ((sum(a * b for a, b in zip(query_vector, centroid)), category)
+             for category, centroid in self._centroids.items()),
+            reverse=True)
+        if not scores:
+            return None
+        best, category = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else -1.0
+        return category, best, best - runner_up
+
+    def classify_vector(self, query_vector) -> Optional[Tuple[str, float]]:
+        scored = self._score(query_vector)
+        if scored is None:
+            return None
+        category, best, margin = scored
+        if best < self.min_similarity or margin < self.min_margin:
+            return None
+        return category, best
+
+    async def aclassify(self, query: str,
+                        embed: Callable[[str], Awaitable[list]] = None) -> Optional[Tuple[str, float, str]]:
+        """(category, confidence, method) or None when the LLM has to decide."""
+        decision = self.classify_rules(query)
+        if decision and decision[1] >= self.min_confidence:
+            return decision[0], decision[1], "rules"
+        if self.centroid_enabled and embed is not None:
+            await self._ensure_centroids(embed)
+            decision = self.classify_vector(await embed(query))
+            if decision:
+                return decision[0], decision[1], "centroid"
+        return None
+
+    async def calibrate(self, labelled: List[Tuple[str, str]], embed: Callable[[str], Awaitable[list]],
+                        target_precision: float = 0.95) -> Optional[dict]:
+        """
+        Pick centroid thresholds from labelled (query, category) pairs. Only queries the rules do not
+        decide are used (that is the traffic the centroid stage sees). Returns the (min_similarity,
+        min_margin) pair with the highest coverage whose precision reaches target_precision, or None
+        when no pair does (keep the centroid disabled then).
+        """
+        await self._ensure_centroids(embed)
+        samples = []
+        for query, expected in labelled:
+            decision = self.classify_rules(query)
+            if decision and decision[1] >= self.min_confidence:
+                continue
+            scored = self._score(await embed(query))
+            if scored:
+                samples.append((*scored, expected))
+        if not samples:
+            return None
+
+        best = None
+        for similarity_step in range(0, 13):
+            min_similarity = round(0.30 + 0.05 * similarity_step, 2)
+            for margin_step in range(0, 11):
+                min_margin = round(0.02 * margin_step, 2)
+                decided = [(category, expected) for category, score, margin, expected in samples
+                           if score >= min_similarity and margin >= min_margin]
+                if not decided:
+                    continue
+                precision = sum(category == expected for category, expected in decided) / len(decided)
+                coverage = len(decided) / len(samples)
+                if precision < target_precision:
+                    continue
+                candidate = {"min_similarity": min_similarity, "min_margin": min_margin,
+                             "precision": round(precision, 3), "coverage": round(coverage, 3),
+                             "samples": len(samples)}
+                if best is None or (coverage, precision) > (best["coverage"], best["precision"]):
+                    best = candidate
+        return best
+
+
+async def _calibrate_from_file(labelled_path: str, target_precision: float):
+    import yaml
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from infrastructure.database import EMBEDDING_MODEL
+
+    with open("prompts/agent_prompt.yaml", "r", encoding="utf-8") as f:
+        rules = yaml.safe_load(f)["router_rules"]
+    with open(labelled_path, "r", encoding="utf-8") as f:
+        labelled = [(row["query"], row["category"]) for row in map(json.loads, filter(str.strip, f))]
+
+    model = HuggingFaceEmbeddings(model=EMBEDDING_MODEL)
+
+    async def embed(text: str):
+        return await asyncio.to_thread(model.embed_query, text)
+
+    result = await FastPathClassifier(rules).calibrate(labelled, embed, target_precision)
+    print(json.dumps(result, indent=2) if result else
+          f"No thresholds reach precision {target_precision}: keep the centroid stage disabled")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calibrate", required=True, help="JSONL of {\"query\": .., \"category\": ..}")
+    parser.add_argument("--precision", type=float, default=0.95)
+    args = parser.parse_args()
+    asyncio.run(_calibrate_from_file(args.calibrate, args.precision))
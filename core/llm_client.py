@@ -1,19 +1,57 @@
+import json
 import os
+import uuid
+from typing import AsyncIterator
 from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.messages import SystemMessage
+from core.fake_llm import ScriptRecorder, ScriptedChatModel
+from core.rate_limiter import get_rate_limiter
+from core.response_cache import ResponseCache, describe_tools, normalize_messages
+from infrastructure.context_builder import estimate_tokens
+
+# call_ai returns the error as text instead of raising; callers must not cache such answers
+# (stream_ai raises instead)
+CALL_AI_ERROR_PREFIX = "Error when calling OpenAI"
 
 
 class LLMClient:
-    def __init__(self, model_name="gpt-4o"):
+    def __init__(self, model_name="gpt-4o", fake_script: str = None, fake_latency: dict = None,
+                 cache: bool = True, cache_path: str = "./llm_response_cache.db", rate_limits: dict = None,
+                 max_output_tokens: int = 1024, record_script: str = None):
+        """
+        model_name "fake" selects the offline ScriptedChatModel (no network) for load tests;
+        fake_script is a JSON/JSONL script file and fake_latency its latency distribution.
+        record_script appends every live model response (not cache hits) to that JSONL file, which can
+        be replayed later with model_name="fake", fake_script=<file>.
+        cache=False disables the persistent response cache (see core/response_cache.py).
+        rate_limits overrides DEFAULT_RATE_LIMITS for this model, e.g. {"requests_per_minute": 10,
+        "tokens_per_minute": 60000}; the limiter is shared by all clients of the same model, so a second
+        client with different rate_limits raises ValueError.
+        """
         self.model_name = model_name
-        if any(keyword in self.model_name for keyword in ["openai", "gpt"]):
+        self.response_cache = ResponseCache(cache_path) if cache else None
+        self.rate_limiter = get_rate_limiter(model_name, rate_limits)
+        self.max_output_tokens = max_output_tokens
+        self.recorder = ScriptRecorder(record_script) if record_script else None
+        # Tool-bound models by tool set: bind_tools converts every tool schema, do it once per tool set
+        self._tool_models = {}
+        if self.model_name.startswith("fake"):
+            latency = fake_latency or {"distribution": "fixed", "ms": 0}
+            if fake_script:
+                self.llm = ScriptedChatModel.from_file(fake_script, latency=latency)
+            else:
+                self.llm = ScriptedChatModel(latency=latency)
+        elif any(keyword in self.model_name for keyword in ["openai", "gpt"]):
             self.llm = ChatOpenAI(
                 model=self.model_name,
                 api_key=os.environ.get("OPENAI_API_KEY"),
                 base_url="https://models.inference.ai.azure.com",
-                temperature=0
+                temperature=0,
+                # 429s, 5xx, timeouts and connection errors are retried by the shared rate limiter
+                # (which also paces the retries), not per request by the SDK
+                max_retries=0
             )
         else:
             self.llm = ChatOllama(
@@ -21,24 +59,80 @@ class LLMClient:
                 temperature=0
             )
 
+    async def _cached(self, method: str, compute, messages, tools=None, schema=None):
+        """Consult the response cache before sending the request (identical in-flight prompts share one call)."""
+        if not self.response_cache:
+            return await compute()
+        key = self.response_cache.make_key(self.model_name, method, messages, tools=tools, schema=schema)
+        return await self.response_cache.get_or_compute(method, key, compute)
+
+    async def _send(self, messages, invoke):
+        """
+        Send one request through the rate limiter; the estimate covers prompt + completion tokens.
+        The response is appended to the record_script, if any.
+        """
+        estimated_tokens = sum(estimate_tokens(content) for _, content in normalize_messages(messages))
+        response = await self.rate_limiter.run(invoke, estimated_tokens + self.max_output_tokens)
+        if self.recorder:
+            self.recorder.record(response)
+        return response
+
     async def call_ai(self, prompt: str, temperature: float = 0.3) -> str:
         print(f"--- [Log] Calling Model: {self.model_name} ---")
         try:
-            # Send message and receive BaseMessage object
-            response = await self.llm.ainvoke([SystemMessage(content=prompt)], {"recursion_limit": 10})
-            return response.content
+            messages = [SystemMessage(content=prompt)]
+
+            async def _compute():
+                # Send message and receive BaseMessage object
+                response = await self._send(messages, lambda: self.llm.ainvoke(messages, {"recursion_limit": 10}))
+                return response.content
+            return await self._cached("call_ai", _compute, messages)
         except Exception as e:
-            return f"Error when calling OpenAI: {str(e)}"
+            return f"{CALL_AI_ERROR_PREFIX}: {str(e)}"
+
+    async def stream_ai(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Streaming call_ai: yields content tokens as the model produces them (llm.astream).
+        Shares call_ai's cache entry and single-flight: a cached answer, or the answer of an identical
+        request already in flight, is yielded as a single chunk; the assembled answer is cached once complete.
+        Unlike call_ai, errors are raised (after any tokens already yielded), so a broken answer is never
+        mistaken for a complete one.
+        """
+        print(f"--- [Log] Streaming Model: {self.model_name} ---")
+        messages = [SystemMessage(content=prompt)]
+        estimated_tokens = estimate_tokens(prompt) + self.max_output_tokens
+
+        async def _tokens():
+            parts = []
+            async for chunk in self.rate_limiter.stream(lambda: self.llm.astream(messages), estimated_tokens):
+                if isinstance(chunk.content, str) and chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+            if self.recorder:
+                # Only complete answers are recorded
+                self.recorder.record(AIMessage(content="".join(parts)))
+
+        if not self.response_cache:
+            async for token in _tokens():
+                yield token
+            return
+        key = self.response_cache.make_key(self.model_name, "call_ai", messages)
+        async for token in self.response_cache.stream_or_share("call_ai", key, _tokens):
+            yield token
 
     async def call_with_json(self, prompt: str):
         try:
-            json_model = self.llm.bind(response_format={"type": "json_object"})
-            response = await json_model.ainvoke([
+            messages = [
                 SystemMessage(
                     content="Your are an assistant just returns data as JSON format."),
                 HumanMessage(content=prompt)
-            ])
-            return response.content
+            ]
+
+            async def _compute():
+                json_model = self.llm.bind(response_format={"type": "json_object"})
+                response = await self._send(messages, lambda: json_model.ainvoke(messages))
+                return response.content
+            return await self._cached("call_with_json", _compute, messages, schema="json_object")
         except Exception as e:
             print(f"JSON API error: {e}")
             return '{"category": "GENERAL", "tools": []}'
@@ -49,13 +143,44 @@ class LLMClient:
         This is wrapper method of with_structured_output of LangChain.
         """
          try:
-            # Init a model that convert to Schema
-            # LangChain will automatically handle JSON Mode and Validation
-            structured_llm = self.llm.with_structured_output(schema)
+            async def _compute():
+                # Init a model that convert to Schema
+                # LangChain will automatically handle JSON Mode and Validation
+                structured_llm = self.llm.with_structured_output(schema)
 
-            # Execute and return result parsed to Python Dict
-            result = await structured_llm.ainvoke(prompt)
-            return result
+                # Execute and return result parsed to Python Dict
+                return await self._send(prompt, lambda: structured_llm.ainvoke(prompt))
+            return await self._cached("get_structured_output", _compute, prompt, schema=schema)
          except Exception as e:
             print(f"--- [LLM Error] Error structure identifying: {e} ---")
             return None
+
+    def bind_tools(self, tools: list):
+        # Keyed by name, description and argument schema: a tool redefined under the same name rebinds
+        key = json.dumps(describe_tools(tools), sort_keys=True, default=str)
+        tool_model = self._tool_models.get(key)
+        if tool_model is None:
+            tool_model = self.llm.bind_tools(tools)
+            self._tool_models[key] = tool_model
+        return tool_model
+
+    async def call_with_tools(self, messages: list, tools: list) -> AIMessage:
+        """Agent step with tools bound. Cached as content + tool calls; tool call ids are regenerated."""
+        async def _compute():
+            tool_llm = self.bind_tools(tools)
+            response = await self._send(messages, lambda: tool_llm.ainvoke(messages))
+            return {
+                "content": response.content,
+                "tool_calls": [{"name": call["name"], "args": call["args"]} for call in response.tool_calls],
+            }
+        data = await self._cached("call_with_tools", _compute, messages, tools=tools)
+        return AIMessage(
+            content=data["content"],
+            tool_calls=[{"name": call["name"], "args": call["args"], "id": f"call_{uuid.uuid4().hex[:24]}"}
+                        for call in data["tool_calls"]])
+
+    def cache_stats(self) -> dict:
+        return self.response_cache.stats() if self.response_cache else {}
+
+    def rate_limit_stats(self) -> dict:
+        return self.rate_limiter.stats()
@@ -0,0 +1,202 @@
+import asyncio
+import random
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+# Per-model provider limits. GitHub Models (models.inference.ai.azure.com) free tier for gpt-4o is
+# ~10 requests/min; local Ollama models and the scripted fake model are not limited (None).
+DEFAULT_RATE_LIMITS = {
+    "gpt-4o": {"requests_per_minute": 10, "tokens_per_minute": 60_000},
+    "gpt-4o-mini": {"requests_per_minute": 15, "tokens_per_minute": 150_000},
+}
+
+_limiters: Dict[str, "RateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled continuously at `capacity` per `period` seconds."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A request bigger than the whole bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float):
+        # May go negative (actual usage > estimate): later callers wait for the debt to refill
+        self.tokens -= amount
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+# OpenAI SDK errors that its own retry loop retries (the SDK runs with max_retries=0, see LLMClient)
+_TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "InternalServerError"}
+
+
+def is_transient_error(error: Exception) -> bool:
+    """5xx, request timeouts and connection errors: worth retrying, but not a reason to slow everyone down."""
+    status = _status_code(error)
+    if status is not None:
+        return status >= 500 or status in (408, 409)
+    return (type(error).__name__ in _TRANSIENT_ERROR_NAMES
+            or isinstance(error, (asyncio.TimeoutError, ConnectionError)))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Async rate limiter with a requests/min and a tokens/min bucket, shared by every LLMClient of a model.
+    Calls go out immediately while both buckets have headroom. A 429 pauses all callers for the
+    provider's Retry-After (or exponential backoff with jitter) and the call is retried.
+    Transient failures (5xx, timeouts, connection errors) are retried with the same backoff, but only
+    the failing call waits.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 max_retries: int = 5, base_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.limits = {"requests_per_minute": requests_per_minute, "tokens_per_minute": tokens_per_minute,
+                       "max_retries": max_retries, "base_backoff": base_backoff, "max_backoff": max_backoff}
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.metrics = {"requests": 0, "throttled_seconds": 0.0, "rate_limited": 0, "transient_errors": 0,
+                        "retries": 0}
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    async def acquire(self, estimated_tokens: int = 0):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(
+                    self._blocked_until - now,
+                    self.request_bucket.wait_time(1, now) if self.request_bucket else 0.0,
+                    self.token_bucket.wait_time(estimated_tokens, now) if self.token_bucket else 0.0,
+                )
+                if wait <= 0:
+                    if self.request_bucket:
+                        self.request_bucket.consume(1)
+                    if self.token_bucket:
+                        self.token_bucket.consume(estimated_tokens)
+                    self.metrics["requests"] += 1
+                    self.metrics["throttled_seconds"] += waited
+                    return
+            # Re-check after sleeping: another coroutine may have taken the refilled capacity
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the tokens/min bucket with the real usage reported by the provider."""
+        if self.token_bucket and actual_tokens is not None:
+            with self._lock:
+                self.token_bucket.consume(actual_tokens - estimated_tokens)
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        delay = _retry_after(error)
+        if delay is None:
+            # Exponential backoff with full jitter so waiting sessions do not retry in lockstep
+            delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        return delay
+
+    async def run(self, call: Callable[[], Awaitable], estimated_tokens: int = 0):
+        """Send `call` when there is headroom; retry it on 429 or a transient error up to max_retries times."""
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(estimated_tokens)
+            try:
+                response = await call()
+            except Exception as e:
+                if not self._retryable(e) or attempt == self.max_retries:
+                    raise
+                await self._on_retryable_error(attempt, e)
+                continue
+            usage = getattr(response, "usage_metadata", None) or {}
+            self.record_usage(estimated_tokens, usage.get("total_tokens"))
+            return response
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator], estimated_tokens: int = 0):
+        """run() for streaming calls: errors are only retried while no chunk has been yielded yet."""
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(estimated_tokens)
+            started = False
+            usage = None
+            try:
+                async for chunk in open_stream():
+                    started = True
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    yield chunk
+            except Exception as e:
+                if started or not self._retryable(e) or attempt == self.max_retries:
+                    raise
+                await self._on_retryable_error(attempt, e)
+                continue
+            self.record_usage(estimated_tokens, (usage or {}).get("total_tokens"))
+            return
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        return is_rate_limit_error(error) or is_transient_error(error)
+
+    async def _on_retryable_error(self, attempt: int, error: Exception):
+        self.metrics["retries"] += 1
+        delay = self._backoff_delay(attempt, error)
+        if is_rate_limit_error(error):
+            # The provider's limit is shared: hold back every caller, acquire() waits it out
+            self.metrics["rate_limited"] += 1
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            print(f"--- [Rate Limit] 429 from provider, retrying in {delay:.1f}s ---")
+        else:
+            self.metrics["transient_errors"] += 1
+            print(f"--- [Rate Limit] {type(error).__name__} from provider, retrying in {delay:.1f}s ---")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return dict(self.metrics)
+
+
+def get_rate_limiter(model_name: str, limits: Optional[dict] = None) -> RateLimiter:
+    """
+    One limiter per model per process, so every client/session draws from the same buckets.
+    The first caller configures it (`limits` or DEFAULT_RATE_LIMITS); later callers may pass None or the
+    same limits. Different limits for an existing limiter raise ValueError instead of being ignored.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limits = limits if limits is not None else DEFAULT_RATE_LIMITS.get(model_name, {})
+            limiter = RateLimiter(**limits)
+            _limiters[model_name] = limiter
+        elif limits is not None and RateLimiter(**limits).limits != limiter.limits:
+            raise ValueError(
+                f"Rate limiter for {model_name!r} already configured with {limiter.limits}, got {limits}")
+        return limiter
@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_messages(messages) -> List[list]:
+    """
+    [type, content] pairs with whitespace collapsed, so re-indented prompts share a cache entry.
+    An AI message with tool calls also carries [name, args, call] per call and a tool result carries
+    the call it answers. Call ids are numbered in order of appearance (they are random per run), so
+    two conversations only share a key when they made the same calls and got the same results.
+    """
+    if isinstance(messages, str):
+        messages = [("human", messages)]
+    normalized = []
+    call_numbers: Dict[str, str] = {}
+
+    def _call_ref(call_id) -> str:
+        return call_numbers.setdefault(call_id, f"call_{len(call_numbers)}")
+
+    for message in messages:
+        extra = []
+        if isinstance(message, BaseMessage):
+            role, content = message.type, message.content
+            tool_calls = getattr(message, "tool_calls", None)
+            if tool_calls:
+                extra.append([[call["name"], call["args"], _call_ref(call.get("id"))] for call in tool_calls])
+            tool_call_id = getattr(message, "tool_call_id", None)
+            if tool_call_id:
+                extra.append(_call_ref(tool_call_id))
+        else:
+            role, content = message
+        if not isinstance(content, str):
+            content = json.dumps(content, sort_keys=True, ensure_ascii=False)
+        normalized.append([role, _WHITESPACE.sub(" ", content).strip(), *extra])
+    return normalized
+
+
+def describe_tools(tools) -> List[list]:
+    """Name, description and argument schema of each bound tool (a changed schema is a new key)."""
+    return [[tool.name, tool.description, getattr(tool, "args", None)] for tool in tools or []]
+
+
+def describe_schema(schema) -> Any:
+    if schema is None or isinstance(schema, (dict, str)):
+        return schema
+    if hasattr(schema, "model_json_schema"):
+        return schema.model_json_schema()
+    return repr(schema)
+
+
+class ResponseCache:
+    """
+    Persistent LLM response cache (SQLite) with TTL and size-bounded LRU eviction.
+    Identical prompts that are in flight at the same time share one request (single-flight).
+    Values must be JSON serialisable; failed calls are never cached.
+    The async entry points run SQLite on a worker thread; the size bound is enforced every
+    trim_every inserts, so the table may briefly hold up to trim_every extra rows.
+    """
+
+    def __init__(self, path: str = "./llm_response_cache.db", max_entries: int = 10_000,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600, trim_every: int = 100):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.trim_every = trim_every
+        self.metrics: Dict[str, Dict[str, int]] = {}
+        self._puts_since_trim = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+        with self._lock:
+            self._trim()
+
+    @staticmethod
+    def make_key(model_name: str, method: str, messages, tools=None, schema=None, **params) -> str:
+        payload = {
+            "model": model_name,
+            "method": method,
+            "messages": normalize_messages(messages),
+            "tools": describe_tools(tools),
+            "schema": describe_schema(schema),
+            "params": params,
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+    def _metric(self, method: str, name: str):
+        counters = self.metrics.setdefault(method, {"hits": 0, "misses": 0, "shared": 0})
+        counters[name] += 1
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and created_at + self.ttl_seconds < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(value)
+
+    def put(self, key: str, value: Any):
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except TypeError:
+            # e.g. a pydantic object from with_structured_output(<model class>) -> not cached
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now))
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= self.trim_every:
+                self._trim()
+            self._conn.commit()
+
+    def _trim(self):
+        """Evict least recently used rows above max_entries (caller holds the lock)."""
+        self._puts_since_trim = 0
+        overflow = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)", (overflow,))
+            self._conn.commit()
+
+    async def aget(self, key: str):
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: Any):
+        await asyncio.to_thread(self.put, key, value)
+
+    async def get_or_compute(self, method: str, key: str, compute: Callable[[], Awaitable[Any]]):
+        cached = await self.aget(key)
+        if cached is not None:
+            self._metric(method, "hits")
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # Same prompt already being sent by another coroutine -> wait for its answer
+            self._metric(method, "shared")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The coroutine that owned the request was cancelled, not us -> send it ourselves
+                return await self.get_or_compute(method, key, compute)
+
+        self._metric(method, "misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting; retrieve the exception so asyncio does not log it as unhandled
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        if value is not None:
+            await self.aput(key, value)
+        return value
+
+    async def stream_or_share(self, method: str, key: str,
+                              open_stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        get_or_compute for streamed text: a cached answer, or the answer of an identical in-flight request
+        (streamed or not), is yielded as one chunk; otherwise the tokens of open_stream() are yielded as
+        they arrive and the joined text is cached once the stream completes. Errors propagate.
+        """
+        cached = await self.aget(key)
+        if cached is not None:
+            self._metric(method, "hits")
+            yield cached
+            return
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._metric(method, "shared")
+            try:
+                shared = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The owner was cancelled or stopped reading -> stream it ourselves
+                shared = None
+            if shared is not None:
+                yield shared
+                return
+            async for token in self.stream_or_share(method, key, open_stream):
+                yield token
+            return
+
+        self._metric(method, "misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        tokens = []
+        try:
+            async for token in open_stream():
+                tokens.append(token)
+                yield token
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled, or the consumer closed the generator early: waiters send the request themselves
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        value = "".join(tokens)
+        future.set_result(value)
+        await self.aput(key, value)
+
+    def stats(self) -> dict:
+        return {method: dict(counters) for method, counters in self.metrics.items()}
@@ -1,19 +1,73 @@
+from core.fast_router import FastPathClassifier
 from core.llm_client import LLMClient
 import json
+import re
 
+from infrastructure.lru_cache import LRUCache
 from services.mcp_service import MCPService
 
+ROUTE_SCHEMA = {
+    "title": "RoutingDecision",  # must have for with_structure_tool method
+    # must have for with_structure_tool method
+    "description": "Classify user's intent and select proper tools",
+    "type": "object",
+    "properties": {
+        "category": {"type": "string", "enum": ["AUTO", "MANUAL", "GENERAL"]},
+        "tools": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "args": {"type": "object"}
+                }
+            }
+        }
+    },
+    "required": ["category", "tools"]
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize_query(query: str) -> str:
+    return _WHITESPACE.sub(" ", query).strip().lower()
+
 
 class PromptRouter:
-    def __init__(self, llm_client: LLMClient, router_prompt_template: str, mcp_service: MCPService):
+    def __init__(self, llm_client: LLMClient, router_prompt_template: str, mcp_service: MCPService,
+                 rules: dict = None, embed_fn=None, decision_cache_size: int = 1024):
+        """
+        rules: the `router_rules` section of prompts/agent_prompt.yaml (None disables the fast path).
+        embed_fn: async query -> embedding (e.g. RAGStorage.aembed_query) for the nearest-centroid model.
+        """
         self.llm = llm_client
         self.template = router_prompt_template
         self.mcp_service = mcp_service
+        self.fast_path = FastPathClassifier(rules) if rules else None
+        self.embed_fn = embed_fn
+        self.metrics = {"fast_path_rules": 0, "fast_path_centroid": 0, "llm": 0}
+        # Tool catalog is serialized once per registry state (see _tool_catalog)
+        self._catalog_signature = None
+        self._catalog_version = 0
+        self._catalog = "[]"
+        # (normalized query, catalog version) -> LLM routing decision
+        self._decision_cache = LRUCache(max_size=decision_cache_size)
 
-    async def get_routing_info(self, query: str) -> dict:
-        tools_metadata = []
-        if self.mcp_service and hasattr(self.mcp_service, 'tools'):
-            for name, tool_obj in self.mcp_service.tools.items():
+    def stats(self) -> dict:
+        return {**self.metrics, "decision_cache": self._decision_cache.stats(),
+                "catalog_version": self._catalog_version}
+
+    def _tool_catalog(self):
+        """
+        Compact JSON of the MCP tools for the router prompt, rebuilt only when the registry changes
+        (tools added, removed or replaced). Returns (catalog_version, catalog_json).
+        """
+        tools = self.mcp_service.tools if self.mcp_service and hasattr(self.mcp_service, 'tools') else {}
+        signature = tuple((name, id(tool_obj["instance"])) for name, tool_obj in tools.items())
+        if signature != self._catalog_signature:
+            tools_metadata = []
+            for name, tool_obj in tools.items():
                 tool_instance = tool_obj["instance"]
                 description = tool_instance.description
                 try:
@@ -29,10 +83,32 @@ class PromptRouter:
                         "param_details": arg_schema.get("properties", {})
                     }
                 )
+            self._catalog = json.dumps(tools_metadata, separators=(",", ":"), ensure_ascii=False)
+            self._catalog_signature = signature
+            self._catalog_version += 1
+        return self._catalog_version, self._catalog
+
+    async def get_routing_info(self, query: str) -> dict:
+        if self.fast_path:
+            decision = await self.fast_path.aclassify(query, self.embed_fn)
+            if decision:
+                category, confidence, method = decision
+                self.metrics[f"fast_path_{method}"] += 1
+                print(f"--- [Router] Fast path ({method}, confidence {confidence:.2f}) -> {category} ---")
+                tools = [{"name": name, "args": {}} for name in self.mcp_service.tools] \
+                    if category == "AUTO" and self.mcp_service else []
+                return {"category": category, "tools": tools}
+        catalog_version, catalog = self._tool_catalog()
+        cache_key = (_normalize_query(query), catalog_version)
+        cached = self._decision_cache.get(cache_key)
+        if cached is not None:
+            print(f"--- [Router] Cached decision -> {cached['category']} ---")
+            return dict(cached)
+        self.metrics["llm"] += 1
 
         prompt = f"""
             AVAILABLE MCP TOOLS AND PARAMETER:
-            {json.dumps(tools_metadata, indent=2, ensure_ascii=False)}
+            {catalog}
             Classify: {query} into: AUTO, MANUAL OR GENERAL.
             If category is MANUAL OR GENERAL, no need to use MCP tools.
             Return JSON:
@@ -41,26 +117,6 @@ class PromptRouter:
                 "tools": [{{ "name": "name", "args": {{ "argument": "value" }} }}]
             }}
             """
-        route_schema = {
-            "title": "RoutingDecision",  # must have for with_structure_tool method
-            # must have for with_structure_tool method
-            "description": "Classify user's intent and select proper tools",
-            "type": "object",
-            "properties": {
-                "category": {"type": "string", "enum": ["AUTO", "MANUAL", "GENERAL"]},
-                "tools": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "name": {"type": "string"},
-                            "args": {"type": "object"}
-                        }
-                    }
-                }
-            },
-            "required": ["category", "tools"]
-        }
         # Ask LLM return the required tool
         # raw_json = await self.llm.call_with_json(prompt)
         # try:
@@ -72,7 +128,10 @@ class PromptRouter:
         #     }
         # except Exception as e:
         #     return {"category": "GENERAL", "tools": []}
-        data = await self.llm.get_structured_output(schema=route_schema, prompt=prompt)
-
-        return data or {"category": "GENERAL", "tools": []}
+        data = await self.llm.get_structured_output(schema=ROUTE_SCHEMA, prompt=prompt)
+        if not data:
+            # LLM failure: default route, not cached
+            return {"category": "GENERAL", "tools": []}
+        self._decision_cache.put(cache_key, data)
+        return data
 
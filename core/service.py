@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import json
+import sys
+import time
+import uuid
+
+from core.executor import TaskExecutor
+from core.llm_client import LLMClient
+from core.router import PromptRouter
+from infrastructure.database import RAGStorage
+from services.mcp_service import MCPService
+from services.session_context import current_session_id
+
+
+class AgentService:
+    """
+    Long-running execution service: heavy resources (embedding model, vector store, browser, compiled
+    graph) are created once and shared; each request runs as its own graph execution.
+
+    Request:  {"id": "..", "query": "..", "session_id": ".." (optional)}
+    Response: {"id", "session_id", "status": "ok", "category", "answer", "latency_ms", "timings_ms"}
+              or {"id", "session_id", "status": "error", "error"}
+    Requests beyond max_concurrency wait for a free slot. Each session gets its own browser context.
+    """
+
+    def __init__(self, prompts: dict, max_concurrency: int = 4, model_name: str = "gpt-4o",
+                 storage: RAGStorage = None, mcp_service: MCPService = None, llm_client: LLMClient = None):
+        self.storage = storage or RAGStorage()
+        self.mcp_service = mcp_service or MCPService()
+        self.llm_client = llm_client or LLMClient(model_name=model_name)
+        self.router = PromptRouter(llm_client=self.llm_client, router_prompt_template=prompts["router"],
+                                   mcp_service=self.mcp_service, rules=prompts.get("router_rules"),
+                                   embed_fn=self.storage.aembed_query)
+        self.executor = TaskExecutor(llm_client=self.llm_client, all_prompts=prompts,
+                                     mcp_service=self.mcp_service, rag_storage=self.storage)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.metrics = {"completed": 0, "failed": 0, "in_flight": 0}
+
+    async def handle(self, request: dict) -> dict:
+        request_id = request.get("id") or uuid.uuid4().hex[:12]
+        session_id = request.get("session_id") or request_id
+        async with self._semaphore:
+            # Everything awaited below (graph nodes, tools) runs in this session's context
+            token = current_session_id.set(session_id)
+            self.metrics["in_flight"] += 1
+            start = time.perf_counter()
+            try:
+                query = request["query"]
+                routing_info = await self.router.get_routing_info(query=query)
+                routed_at = time.perf_counter()
+                answer = await self.executor.execute(query=query, routing_info=routing_info)
+                end = time.perf_counter()
+                self.metrics["completed"] += 1
+                return {
+                    "id": request_id,
+                    "session_id": session_id,
+                    "status": "ok",
+                    "category": routing_info["category"],
+                    "answer": answer,
+                    "latency_ms": round((end - start) * 1000, 1),
+                    "timings_ms": {"route": round((routed_at - start) * 1000, 1),
+                                   "execute": round((end - routed_at) * 1000, 1)},
+                }
+            except Exception as e:
+                self.metrics["failed"] += 1
+                return {"id": request_id, "session_id": session_id, "status": "error", "error": str(e)}
+            finally:
+                if not request.get("session_id"):
+                    # One-off request: its browser context goes back to the pool right away.
+                    # Named sessions keep theirs for follow-up queries until reaped when idle.
+                    await self.mcp_service.web_automation_service.close_session(session_id)
+                self.metrics["in_flight"] -= 1
+                current_session_id.reset(token)
+
+    async def start(self):
+        """Launch the shared browser and pre-spawn warm contexts so the first request does not pay for it."""
+        await self.mcp_service.web_automation_service.warmup()
+
+    async def close(self):
+        await self.mcp_service.web_automation_service.cleanup()
+        self.storage.close()
+
+    async def serve_stdin(self):
+        """One JSON request per stdin line, one JSON response per stdout line (in completion order)."""
+        out = sys.stdout
+        loop = asyncio.get_running_loop()
+        tasks = set()
+
+        async def _run(request):
+            response = await self.handle(request)
+            out.write(json.dumps(response, ensure_ascii=False) + "\n")
+            out.flush()
+
+        # Logs go to stderr so stdout stays valid JSONL
+        with contextlib.redirect_stdout(sys.stderr):
+            while True:
+                line = await loop.run_in_executor(None, sys.stdin.readline)
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    out.write(json.dumps({"error": f"Invalid JSON: {e}"}) + "\n")
+                    out.flush()
+                    continue
+                task = asyncio.create_task(_run(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+
+    async def serve_http(self, host: str = "127.0.0.1", port: int = 8080):
+        """Minimal local HTTP/1.1 endpoint: POST /query with a JSON request body; GET /health."""
+
+        async def _on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                request_line = (await reader.readline()).decode("latin-1").split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if request_line[:2] == ["GET", "/health"]:
+                    status, payload = 200, {"status": "ok", **self.metrics,
+                                            "browser": self.mcp_service.web_automation_service.stats()}
+                elif request_line[:2] == ["POST", "/query"]:
+                    try:
+                        status, payload = 200, await self.handle(json.loads(body or b"{}"))
+                    except (json.JSONDecodeError, AttributeError) as e:
+                        status, payload = 400, {"error": f"Invalid JSON: {e}"}
+                else:
+                    status, payload = 404, {"error": "Use POST /query or GET /health"}
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: close\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+            except Exception as e:
+                print(f"--- [Service] Bad HTTP request: {e} ---")
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(_on_connection, host, port)
+        print(f"--- [Service] Listening on http://{host}:{port} (max {self.max_concurrency} concurrent) ---")
+        async with server:
+            await server.serve_forever()
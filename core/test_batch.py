@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from core.batch import completed_ids, read_requests, run_batch, summarize
+
+
+class _FlakyService:
+    """Stand-in for AgentService.handle: queries listed in `failing` fail until `failing` is cleared."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.handled = []
+
+    async def handle(self, request: dict) -> dict:
+        self.handled.append(request["id"])
+        if request["query"] in self.failing:
+            return {"id": request["id"], "session_id": request["id"], "status": "error", "error": "LLM timeout"}
+        return {"id": request["id"], "session_id": request["id"], "status": "ok", "category": "GENERAL",
+                "answer": f"answer to {request['query']}", "latency_ms": 10.0,
+                "timings_ms": {"route": 1.0, "execute": 9.0}}
+
+
+def _write_lines(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+
+
+def test_read_requests_assigns_stable_ids(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text('{"query": "a"}\n\n{"id": "x", "query": "b"}\n', encoding="utf-8")
+    assert [request["id"] for request in read_requests(str(path))] == ["line-1", "x"]
+
+
+def test_completed_ids_skips_errors_and_truncated_lines(tmp_path):
+    path = tmp_path / "results.jsonl"
+    _write_lines(path, [
+        {"id": "ok", "status": "ok", "answer": "fine"},
+        {"id": "failed", "status": "error", "error": "boom"},
+        {"id": "no-status", "answer": "fine"},
+    ])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": "cut-off", "status": "o')
+    assert completed_ids(str(path)) == {"ok"}
+
+
+def test_completed_ids_of_missing_file(tmp_path):
+    assert completed_ids(str(tmp_path / "nope.jsonl")) == set()
+
+
+def test_failed_queries_are_retried_on_resume(tmp_path):
+    queries = tmp_path / "queries.jsonl"
+    _write_lines(queries, [{"id": f"q{i}", "query": f"query {i}"} for i in range(5)])
+    out = tmp_path / "results.jsonl"
+
+    service = _FlakyService(failing={"query 1", "query 3"})
+    report = asyncio.run(run_batch(service, str(queries), str(out), workers=2))
+    assert report["completed"] == 3 and report["failed"] == 2
+
+    service.failing.clear()
+    service.handled.clear()
+    report = asyncio.run(run_batch(service, str(queries), str(out), workers=2))
+    assert sorted(service.handled) == ["q1", "q3"]
+    assert (report["completed"], report["failed"], report["skipped"]) == (2, 0, 3)
+    assert completed_ids(str(out)) == {f"q{i}" for i in range(5)}
+
+
+def test_summarize_reports_stage_percentiles():
+    results = [{"id": "a", "status": "ok", "latency_ms": 10.0, "timings_ms": {"route": 2.0, "execute": 8.0}},
+               {"id": "b", "status": "error", "error": "boom"}]
+    report = summarize(results, wall_seconds=2.0)
+    assert report["completed"] == 1 and report["failed"] == 1
+    assert set(report["stages_ms"]) == {"total", "route", "execute"}
+    assert report["throughput_qps"] == 1.0
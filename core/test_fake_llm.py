@@ -0,0 +1,82 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from pydantic import BaseModel
+
+from core.fake_llm import ScriptRecorder, ScriptedChatModel
+
+SCRIPT = [
+    {"role": "tool", "content": "after tool"},
+    {"match": r"(?i)playwright", "content": "scanning", "tool_calls": [{"name": "mcp_scan_web_tool", "args": {}}]},
+    {"content": "first"},
+    {"content": "second"},
+    {"structured": {"category": "AUTO", "tools": []}, "match": "classify: script"},
+    {"structured": {"category": "GENERAL", "tools": []}},
+]
+
+
+class Route(BaseModel):
+    category: str
+    tools: list
+
+
+def test_match_and_role_select_an_entry():
+    model = ScriptedChatModel(script=SCRIPT)
+    assert model.invoke([HumanMessage(content="Write a Playwright test")]).content == "scanning"
+    assert model.invoke([ToolMessage(content="selectors", tool_call_id="call_1")]).content == "after tool"
+
+
+def test_unconditional_entries_cycle_in_order():
+    model = ScriptedChatModel(script=SCRIPT)
+    replies = [model.invoke([HumanMessage(content="hello")]).content for _ in range(3)]
+    assert replies == ["first", "second", "first"]
+
+
+def test_tool_calls_get_unique_ids():
+    model = ScriptedChatModel(script=SCRIPT)
+    calls = [model.invoke([HumanMessage(content="playwright")]).tool_calls[0] for _ in range(2)]
+    assert [call["name"] for call in calls] == ["mcp_scan_web_tool"] * 2
+    assert calls[0]["id"] != calls[1]["id"]
+
+
+def test_structured_output_as_dict_and_schema():
+    model = ScriptedChatModel(script=SCRIPT)
+    assert model.with_structured_output(dict).invoke("classify: script") == {"category": "AUTO", "tools": []}
+    routed = asyncio.run(model.with_structured_output(Route).ainvoke("classify: hello"))
+    assert routed == Route(category="GENERAL", tools=[])
+
+
+def test_astream_yields_word_chunks_then_tool_calls():
+    model = ScriptedChatModel(script=[{"content": "Open the page now",
+                                       "tool_calls": [{"name": "mcp_scan_web_tool", "args": {"url": "/"}}]}])
+
+    async def collect():
+        return [chunk async for chunk in model.astream([HumanMessage(content="go")])]
+
+    chunks = asyncio.run(collect())
+    assert [chunk.content for chunk in chunks if chunk.content] == ["Open", " the", " page", " now"]
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged += chunk
+    assert merged.content == "Open the page now"
+    assert merged.tool_calls[0]["name"] == "mcp_scan_web_tool"
+    assert merged.tool_calls[0]["args"] == {"url": "/"}
+
+
+def test_fixed_latency_is_applied():
+    model = ScriptedChatModel(script=[{"content": "x"}], latency={"distribution": "fixed", "ms": 30})
+    assert model._sample_latency() == 0.03
+
+
+def test_recorded_responses_replay_in_order(tmp_path):
+    path = tmp_path / "recorded.jsonl"
+    recorder = ScriptRecorder(str(path))
+    recorder.record(AIMessage(content="", tool_calls=[{"name": "mcp_scan_web_tool", "args": {}, "id": "call_x"}]))
+    recorder.record(Route(category="AUTO", tools=[]))
+    recorder.record(AIMessage(content="Final Answer: done"))
+
+    model = ScriptedChatModel.from_file(str(path))
+    messages = [SystemMessage(content="any prompt")]
+    assert model.invoke(messages).tool_calls[0]["name"] == "mcp_scan_web_tool"
+    assert model.invoke(messages).content == "Final Answer: done"
+    assert model.with_structured_output(Route).invoke("q") == Route(category="AUTO", tools=[])
@@ -0,0 +1,87 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+import yaml
+
+from core.fast_router import FastPathClassifier
+
+PROMPTS = Path(__file__).resolve().parent.parent / "prompts" / "agent_prompt.yaml"
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    with open(PROMPTS, "r", encoding="utf-8") as f:
+        return FastPathClassifier(yaml.safe_load(f)["router_rules"])
+
+
+@pytest.mark.parametrize("query, category", [
+    ("Hi, please write a manual test plan for the checkout flow", "MANUAL"),
+    ("Thanks. Now describe the test steps for the cart", "MANUAL"),
+    ("hey can you list test scenarios for registration", "MANUAL"),
+    ("Generate a Playwright script for the login page", "AUTO"),
+    ("Open https://shop.example.com and add an item to the cart", "AUTO"),
+    ("Hello!", "GENERAL"),
+    ("thank you", "GENERAL"),
+    ("  how are you?  ", "GENERAL"),
+])
+def test_rules(classifier, query, category):
+    assert classifier.classify_rules(query)[0] == category
+
+
+def test_greeting_with_a_real_question_is_not_general(classifier):
+    # No rule matches -> centroid / LLM decides
+    assert classifier.classify_rules("Hi, what does the checkout page validate?") is None
+
+
+# 2-d "embeddings": AUTO along x, MANUAL along y
+EXAMPLE_VECTORS = {"auto example": [1.0, 0.0], "manual example": [0.0, 1.0]}
+CENTROID_RULES = {"categories": {}, "centroid": {
+    "enabled": True, "min_similarity": 0.8, "min_margin": 0.2,
+    "examples": {"AUTO": ["auto example"], "MANUAL": ["manual example"]}}}
+
+
+def _embedder(vectors, calls=None):
+    async def embed(text):
+        if calls is not None:
+            calls.append(text)
+        await asyncio.sleep(0)
+        return vectors[text]
+    return embed
+
+
+def test_centroid_decides_only_when_confident():
+    vectors = {**EXAMPLE_VECTORS, "clearly auto": [0.95, 0.05], "in between": [0.7, 0.7]}
+    classifier = FastPathClassifier(CENTROID_RULES)
+    embed = _embedder(vectors)
+    assert asyncio.run(classifier.aclassify("clearly auto", embed))[::2] == ("AUTO", "centroid")
+    assert asyncio.run(classifier.aclassify("in between", embed)) is None
+
+
+def test_centroids_are_built_once_under_concurrency():
+    vectors = {**EXAMPLE_VECTORS, "q": [1.0, 0.0]}
+    calls = []
+    classifier = FastPathClassifier(CENTROID_RULES)
+    embed = _embedder(vectors, calls)
+
+    async def main():
+        await asyncio.gather(*(classifier.aclassify("q", embed) for _ in range(5)))
+
+    asyncio.run(main())
+    assert calls.count("auto example") == 1
+    assert calls.count("manual example") == 1
+
+
+def test_calibrate_picks_thresholds_that_reach_the_target_precision():
+    vectors = {
+        **EXAMPLE_VECTORS,
+        "auto 1": [0.99, 0.1], "auto 2": [0.9, 0.3], "manual 1": [0.1, 0.99],
+        # Looks like AUTO but is MANUAL: only excluded by a high similarity threshold
+        "tricky": [0.8, 0.6],
+    }
+    labelled = [("auto 1", "AUTO"), ("auto 2", "AUTO"), ("manual 1", "MANUAL"), ("tricky", "MANUAL")]
+    classifier = FastPathClassifier(CENTROID_RULES)
+    result = asyncio.run(classifier.calibrate(labelled, _embedder(vectors), target_precision=1.0))
+    assert result["precision"] == 1.0
+    assert result["coverage"] == 0.75
+    assert result["samples"] == 4
@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import pytest
+
+from core.rate_limiter import RateLimiter, TokenBucket, get_rate_limiter, is_transient_error
+
+
+class _ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class _Response:
+    usage_metadata = {"total_tokens": 10}
+
+
+def _flaky(failures):
+    """Awaitable factory that raises the given errors first, then succeeds."""
+    calls = {"count": 0}
+
+    async def call():
+        calls["count"] += 1
+        if failures:
+            raise failures.pop(0)
+        return _Response()
+    return call, calls
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(capacity=60, period=60.0)
+    now = bucket.updated_at
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.consume(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == pytest.approx(0.0)
+
+
+def test_oversized_request_waits_for_a_full_bucket_only():
+    bucket = TokenBucket(capacity=10, period=10.0)
+    now = bucket.updated_at
+    bucket.consume(10)
+    assert bucket.wait_time(1000, now) == pytest.approx(10.0)
+
+
+def test_requests_per_minute_is_enforced():
+    limiter = RateLimiter(requests_per_minute=600)  # 10/s, burst of 600
+    limiter.request_bucket.tokens = 2
+
+    async def main():
+        start = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.09
+    assert limiter.stats()["requests"] == 3
+
+
+def test_429_is_retried_and_blocks_other_callers():
+    limiter = RateLimiter(base_backoff=0.01)
+    call, calls = _flaky([_ProviderError(429)])
+    asyncio.run(limiter.run(call))
+    assert calls["count"] == 2
+    assert limiter.stats()["rate_limited"] == 1
+    assert limiter._blocked_until > 0
+
+
+def test_transient_errors_are_retried_without_blocking_others():
+    limiter = RateLimiter(base_backoff=0.01)
+    call, calls = _flaky([_ProviderError(503), TimeoutError("read timeout")])
+    asyncio.run(limiter.run(call))
+    assert calls["count"] == 3
+    assert limiter.stats()["transient_errors"] == 2
+    assert limiter._blocked_until == 0.0
+
+
+def test_client_errors_are_not_retried():
+    limiter = RateLimiter(base_backoff=0.01)
+    call, calls = _flaky([_ProviderError(400)])
+    with pytest.raises(_ProviderError):
+        asyncio.run(limiter.run(call))
+    assert calls["count"] == 1
+
+
+def test_retries_are_bounded():
+    limiter = RateLimiter(base_backoff=0.001, max_retries=2)
+    call, calls = _flaky([_ProviderError(500)] * 5)
+    with pytest.raises(_ProviderError):
+        asyncio.run(limiter.run(call))
+    assert calls["count"] == 3
+
+
+def test_stream_is_not_retried_after_the_first_chunk():
+    limiter = RateLimiter(base_backoff=0.001)
+    opened = {"count": 0}
+
+    async def open_stream():
+        opened["count"] += 1
+        yield "partial"
+        raise _ProviderError(502)
+
+    async def main():
+        return [chunk async for chunk in limiter.stream(open_stream)]
+
+    with pytest.raises(_ProviderError):
+        asyncio.run(main())
+    assert opened["count"] == 1
+
+
+def test_is_transient_error():
+    assert is_transient_error(_ProviderError(500))
+    assert is_transient_error(ConnectionResetError())
+    assert not is_transient_error(_ProviderError(401))
+    assert not is_transient_error(ValueError("bad"))
+
+
+def test_limiter_is_shared_per_model_and_rejects_conflicting_limits():
+    limits = {"requests_per_minute": 5, "tokens_per_minute": 1000}
+    first = get_rate_limiter("test-shared-model", limits)
+    assert get_rate_limiter("test-shared-model") is first
+    assert get_rate_limiter("test-shared-model", dict(limits)) is first
+    with pytest.raises(ValueError):
+        get_rate_limiter("test-shared-model", {"requests_per_minute": 50})
@@ -0,0 +1,156 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from core.response_cache import ResponseCache, normalize_messages
+
+
+def _tool_turn(args: dict, result: str, call_id: str = "call_abc"):
+    return [
+        HumanMessage(content="Open the login page"),
+        AIMessage(content="", tool_calls=[{"name": "navigate", "args": args, "id": call_id}]),
+        ToolMessage(content=result, tool_call_id=call_id),
+    ]
+
+
+class _Tool:
+    def __init__(self, name: str, description: str, args: dict):
+        self.name, self.description, self.args = name, description, args
+
+
+def test_whitespace_does_not_change_the_key():
+    a = ResponseCache.make_key("gpt-4o", "call_ai", "Write  a test\n plan")
+    b = ResponseCache.make_key("gpt-4o", "call_ai", "Write a test plan")
+    assert a == b
+
+
+def test_tool_call_arguments_are_part_of_the_key():
+    a = ResponseCache.make_key("gpt-4o", "call_with_tools", _tool_turn({"url": "/login"}, "ok"))
+    b = ResponseCache.make_key("gpt-4o", "call_with_tools", _tool_turn({"url": "/cart"}, "ok"))
+    assert a != b
+
+
+def test_tool_results_are_part_of_the_key():
+    a = ResponseCache.make_key("gpt-4o", "call_with_tools", _tool_turn({"url": "/login"}, "ok"))
+    b = ResponseCache.make_key("gpt-4o", "call_with_tools", _tool_turn({"url": "/login"}, "timeout"))
+    assert a != b
+
+
+def test_random_tool_call_ids_share_a_key():
+    a = ResponseCache.make_key("gpt-4o", "call_with_tools", _tool_turn({"url": "/login"}, "ok", "call_1"))
+    b = ResponseCache.make_key("gpt-4o", "call_with_tools", _tool_turn({"url": "/login"}, "ok", "call_2"))
+    assert a == b
+
+
+def test_tool_result_is_tied_to_its_call():
+    messages = [
+        HumanMessage(content="q"),
+        AIMessage(content="", tool_calls=[{"name": "scan", "args": {}, "id": "x"},
+                                          {"name": "scan", "args": {}, "id": "y"}]),
+        ToolMessage(content="r", tool_call_id="y"),
+    ]
+    assert normalize_messages(messages)[2] == ["tool", "r", "call_1"]
+
+
+def test_bound_tool_schema_is_part_of_the_key():
+    tools_v1 = [_Tool("click", "Click an element", {"selector": {"type": "string"}})]
+    tools_v2 = [_Tool("click", "Click an element", {"selector": {"type": "string"}, "force": {"type": "boolean"}})]
+    a = ResponseCache.make_key("gpt-4o", "call_with_tools", "q", tools=tools_v1)
+    b = ResponseCache.make_key("gpt-4o", "call_with_tools", "q", tools=tools_v2)
+    assert a != b
+
+
+def test_single_flight_shares_one_call(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("call_ai", "k", compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert calls == 1
+    assert cache.stats()["call_ai"] == {"hits": 0, "misses": 1, "shared": 4}
+    # Persisted: the next call is a hit without computing
+    assert asyncio.run(cache.get_or_compute("call_ai", "k", compute)) == "answer"
+    assert calls == 1
+
+
+def test_failed_calls_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def main():
+        try:
+            await cache.get_or_compute("call_ai", "k", fail)
+        except RuntimeError:
+            pass
+        return await cache.aget("k")
+
+    assert asyncio.run(main()) is None
+
+
+def test_size_bound_is_enforced_periodically(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=5, trim_every=10)
+    for i in range(25):
+        cache.put(f"k{i}", i)
+    count = cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    assert 5 <= count < 5 + 10
+    # The most recent entry survives eviction
+    assert cache.get("k24") == 24
+
+
+def _token_stream(tokens, calls, fail_after=None):
+    async def open_stream():
+        calls["count"] += 1
+        for i, token in enumerate(tokens):
+            if fail_after is not None and i == fail_after:
+                raise RuntimeError("stream dropped")
+            await asyncio.sleep(0.01)
+            yield token
+    return open_stream
+
+
+def test_concurrent_identical_streams_share_one_call(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    calls = {"count": 0}
+    open_stream = _token_stream(["Hel", "lo"], calls)
+
+    async def consume():
+        return [token async for token in cache.stream_or_share("call_ai", "k", open_stream)]
+
+    async def main():
+        return await asyncio.gather(consume(), consume(), consume())
+
+    owner, *waiters = asyncio.run(main())
+    assert owner == ["Hel", "lo"]
+    assert waiters == [["Hello"], ["Hello"]]
+    assert calls["count"] == 1
+    # A later non-streamed call for the same key is served from the cache
+    assert asyncio.run(cache.aget("k")) == "Hello"
+
+
+def test_failed_stream_raises_and_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    calls = {"count": 0}
+    open_stream = _token_stream(["partial", " answer"], calls, fail_after=1)
+    received = []
+
+    async def main():
+        try:
+            async for token in cache.stream_or_share("call_ai", "k", open_stream):
+                received.append(token)
+        except RuntimeError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+    assert received == ["partial"]
+    assert asyncio.run(cache.aget("k")) is None
@@ -0,0 +1,67 @@
+"""
+Startup benchmark for RAGStorage ingestion on a synthetic corpus.
+
+Compares, on an already indexed and unchanged corpus:
+- before: load_entire_knowledge_base() + index() (what every RAGStorage() used to do)
+- after:  RAGStorage.sync_knowledge_base() (manifest fast path, stat only)
+
+Usage: python -m infrastructure.bench_startup --files 3000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_classic.indexes import index
+
+import infrastructure.data_util as data_util
+from infrastructure.corpus_manifest import CorpusManifest
+from infrastructure.database import RAGStorage
+from infrastructure.rag_benchmark import generate_synthetic_corpus
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=3000)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="rag_startup_bench_"))
+    try:
+        data_dir = work_dir / "data"
+        generate_synthetic_corpus(data_dir, args.files, cases_per_file=1)
+
+        # Cold start: everything is new and gets embedded once
+        cold_time, storage = _timed(lambda: RAGStorage(
+            db_path=str(work_dir / "db"),
+            record_db=f"sqlite:///{work_dir / 'records.db'}",
+            data_dir=str(data_dir)))
+        print(f"Cold start (embed {args.files} files): {cold_time:.2f}s")
+
+        before_time, result = _timed(lambda: index(
+            data_util.load_entire_knowledge_base(str(data_dir)),
+            storage.record_manager,
+            storage.vector_store,
+            cleanup="incremental",
+            source_id_key="source"))
+        print(f"Before (load + index, unchanged corpus): {before_time:.3f}s -> {result}")
+
+        after_time, _ = _timed(storage.sync_knowledge_base)
+        print(f"After (manifest fast path, unchanged corpus): {after_time:.3f}s")
+
+        scan_time, _ = _timed(lambda: CorpusManifest(
+            str(work_dir / "db" / "corpus_manifest.json"), str(data_dir)).scan())
+        print(f"  of which manifest load + stat scan: {scan_time:.3f}s")
+        print(f"Speed-up: {before_time / max(after_time, 1e-9):.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+from typing import Callable, List, Optional
+
+from langchain_core.documents import Document
+
+from infrastructure.metadata_filter import metadata_matches
+
+# Order in which the sections of one test case are rendered (see data_util)
+SECTION_ORDER = ["intent", "conditions", "ui_elements", "test_steps", "validation_rules", "metadata"]
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting English/code prompts
+    return len(text) // 4 + 1
+
+
+def _strip_test_id_line(content: str) -> str:
+    # Every JSON chunk starts with "Test ID: ..." which the block header already carries
+    if content.startswith("Test ID:"):
+        return content.split("\n", 1)[1] if "\n" in content else ""
+    return content
+
+
+def build_context(
+    hits: List[Document],
+    get_test_case_chunks: Callable[[str], List[Document]],
+    token_budget: int = 1500,
+    max_test_cases: int = 2,
+    skip_sections: Optional[set] = None,
+    where: Optional[dict] = None,
+) -> str:
+    """
+    Turn ranked search hits into a compact prompt context.
+    Hits belonging to a test case are expanded to all sibling chunks of that test_id (rendered once,
+    in SECTION_ORDER); other hits are rendered as-is. Rendering stops when token_budget is used up.
+    `where` is the metadata filter the hits were searched with: siblings outside it are not pulled in.
+    """
+    skip_sections = {"metadata"} if skip_sections is None else skip_sections
+    blocks = []
+    used_tokens = 0
+    seen_test_ids = set()
+    seen_contents = set()
+
+    def _try_add(text: str) -> bool:
+        nonlocal used_tokens
+        cost = estimate_tokens(text)
+        if used_tokens + cost > token_budget:
+            return False
+        blocks.append(text)
+        used_tokens += cost
+        return True
+
+    for hit in hits:
+        test_id = hit.metadata.get("test_id")
+        if test_id:
+            if test_id in seen_test_ids or len(seen_test_ids) >= max_test_cases:
+                continue
+            seen_test_ids.add(test_id)
+            chunks = get_test_case_chunks(test_id) or [hit]
+            chunks = sorted(
+                (chunk for chunk in chunks
+                 if chunk.metadata.get("section") not in skip_sections and metadata_matches(chunk.metadata, where)),
+                key=lambda chunk: SECTION_ORDER.index(chunk.metadata["section"])
+                if chunk.metadata.get("section") in SECTION_ORDER else len(SECTION_ORDER))
+            if not _try_add(f"## Test case: {test_id}"):
+                break
+            for chunk in chunks:
+                if chunk.page_content in seen_contents:
+                    continue
+                seen_contents.add(chunk.page_content)
+                body = _strip_test_id_line(chunk.page_content).strip()
+                # Keep going with smaller sections when a big one does not fit
+                if body:
+                    _try_add(body)
+        else:
+            if hit.page_content in seen_contents:
+                continue
+            seen_contents.add(hit.page_content)
+            _try_add(f"## Source: {hit.metadata.get('source', 'unknown')}\n{hit.page_content.strip()}")
+
+    return "\n\n".join(blocks)
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class CorpusManifest:
+    """
+    Persisted fingerprint (mtime/size/sha256) of every file in the knowledge base directory.
+    A file whose mtime and size are unchanged is treated as unchanged and is never opened again,
+    so checking an unchanged corpus costs one os.stat() per file.
+    Chunks are stamped with the file's path relative to the directory as their 'source' (source()),
+    so files with the same name in different folders are indexed independently.
+    """
+    VERSION = 2
+
+    def __init__(self, manifest_path: str, directory_path: str):
+        self.manifest_path = Path(manifest_path)
+        self.directory_path = Path(directory_path)
+        # Bare file names older versions used as 'source' and that may still be in the index
+        # (None: unknown, derived from the directory on the next scan)
+        self.legacy_sources: Optional[Set[str]] = None
+        self.entries: Dict[str, dict] = self._load()
+        self._pending: Dict[str, dict] = {}
+        self._removed: Set[str] = set()
+        self._legacy_kept: Set[str] = set()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        # A manifest written for another directory/format is useless -> start from scratch
+        if data.get("version") != self.VERSION or data.get("directory") != str(self.directory_path.resolve()):
+            return {}
+        self.legacy_sources = set(data.get("legacy_sources", []))
+        return data.get("files", {})
+
+    def source(self, file_path) -> str:
+        """'source' metadata of a file's chunks: its path relative to the directory."""
+        return Path(file_path).relative_to(self.directory_path).as_posix()
+
+    @staticmethod
+    def _hash_file(file_path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _walk(self):
+        stack = [self.directory_path]
+        while stack:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file():
+                        yield Path(entry.path), entry.stat()
+
+    def scan(self) -> Tuple[List[Path], List[str]]:
+        """
+        Compare the directory with the manifest.
+        Return (files that are new or whose content changed, sources that no longer have any file).
+        Nothing is persisted until commit() is called.
+        """
+        if not self.directory_path.exists():
+            raise FileNotFoundError(f"Directory not found: {self.directory_path}")
+
+        self._pending = {}
+        self._legacy_kept = set()
+        changed_files = []
+        seen = set()
+        names = set()
+
+        for file_path, st in self._walk():
+            rel_path = self.source(file_path)
+            seen.add(rel_path)
+            names.add(file_path.name)
+            entry = self.entries.get(rel_path)
+
+            # Fast path: same mtime + size -> skip without opening the file
+            if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                continue
+
+            sha256 = self._hash_file(file_path)
+            self._pending[rel_path] = {
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "sha256": sha256,
+                "source": rel_path,
+            }
+            # Touched but identical content (e.g. git checkout) -> only refresh the fingerprint
+            if entry and entry["sha256"] == sha256:
+                continue
+            changed_files.append(file_path)
+
+        self._removed = set(self.entries) - seen
+        if self.legacy_sources is None:
+            # No usable manifest: the index may predate relative-path sources
+            self.legacy_sources = names - seen
+        # A top-level file's relative path is its name: that source is current, not legacy
+        self.legacy_sources -= seen
+        removed_sources = sorted({self.entries[rel]["source"] for rel in self._removed} | self.legacy_sources)
+        return changed_files, removed_sources
+
+    def discard(self, file_paths):
+        """
+        Leave these files out of the next commit(): their old entry (if any) is kept, so the next
+        scan() reports them as changed again. Used for files that failed to parse; the legacy source
+        of such a file is kept too, until the file is indexed.
+        """
+        for file_path in file_paths:
+            self._pending.pop(self.source(file_path), None)
+            if Path(file_path).name in (self.legacy_sources or ()):
+                self._legacy_kept.add(Path(file_path).name)
+
+    def commit(self):
+        """Persist the result of the last scan(). Call it only after indexing succeeded."""
+        if not self._pending and not self._removed and not self.legacy_sources and self.manifest_path.exists():
+            return
+        for rel_path in self._removed:
+            self.entries.pop(rel_path, None)
+        self.entries.update(self._pending)
+        self.legacy_sources = self._legacy_kept
+        self._pending = {}
+        self._removed = set()
+        self._legacy_kept = set()
+
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": self.VERSION,
+                "directory": str(self.directory_path.resolve()),
+                "files": self.entries,
+                "legacy_sources": sorted(self.legacy_sources),
+            }, f)
+        os.replace(tmp_path, self.manifest_path)
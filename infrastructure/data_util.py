@@ -1,6 +1,9 @@
 import json
+import multiprocessing
 from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader, TextLoader
-from typing import List
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional
 from pathlib import Path
 from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import JSONLoader
@@ -34,6 +37,230 @@ from langchain_text_splitters import MarkdownHeaderTextSplitter
 #     print(f"Successfully loaded {len(docs)} documents from the data repository.")
 #     return docs
 
+# Parsed by our own code or TextLoader: cheap enough to stay in the caller's process
+IN_PROCESS_SUFFIXES = {".json", ".txt", ".csv", ".yaml", ".yml"}
+
+
+def load_file_chunks(file_path: Path, splitter: RecursiveCharacterTextSplitter,
+                     raise_errors: bool = False, source: Optional[str] = None) -> List[Document]:
+    """
+    Parse a single knowledge-base file into chunks (JSON test cases are split per section).
+    Chunks get `source` as 'source' metadata (default: the file name).
+    A file that cannot be read or parsed is skipped with a warning, or re-raised with raise_errors
+    (incremental sync must not mistake an unreadable file for an empty one).
+    """
+    file_chunks = []
+    suffix = file_path.suffix.lower()
+    source = source or file_path.name
+
+    try:
+        # ---- XỬ LÝ RIÊNG FILE JSON (Bóc tách từng Test Case) ----
+        if suffix == ".json":
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+                # Nếu JSON là list test cases
+                if isinstance(data, list):
+                    for item in data:
+                        test_id = item.get("test_id", "unknown_test")
+                        tags = item.get("tags", [])
+                        scope = item.get("scope", "")
+                        test_type = item.get("test_type", "")
+
+                        # -------- 1. INTENT CHUNK (WHY) --------
+                        intent = item.get("intent", {})
+                        intent_content = (
+                            f"Test ID: {test_id}\n"
+                            f"Intent Summary: {intent.get('summary', '')}\n"
+                            f"Business Value: {intent.get('business_value', '')}\n"
+                            f"Scope: {scope}\n"
+                            f"Test Type: {test_type}"
+                        )
+
+                        file_chunks.append(
+                            Document(
+                                page_content=intent_content,
+                                metadata={
+                                    "source": source,
+                                    "test_id": test_id,
+                                    "section": "intent",
+                                    "scope": scope,
+                                    "tags": ",".join(tags)
+                                }
+                            )
+                        )
+
+                        # -------- 2. UI ELEMENTS CHUNK (WHAT) --------
+                        ui_elements = item.get("ui_elements", {})
+                        if ui_elements:
+                            ui_lines = [f"Test ID: {test_id}", "UI Elements:"]
+                            for name, el in ui_elements.items():
+                                ui_lines.append(
+                                    f"- {name} | role: {el.get('role')} | "
+                                    f"purpose: {el.get('purpose')} | "
+                                    f"locators: {', '.join(el.get('locator_hints', []))}"
+                                )
+
+                            file_chunks.append(
+                                Document(
+                                    page_content="\n".join(ui_lines),
+                                    metadata={
+                                        "source": source,
+                                        "test_id": test_id,
+                                        "section": "ui_elements",
+                                        "tags": ",".join(tags)
+                                    }
+                                )
+                            )
+
+                        # -------- 3. TEST STEPS CHUNK (HOW) --------
+                        steps = item.get("test_steps", [])
+                        if steps:
+                            step_lines = [f"Test ID: {test_id}", "Test Steps:"]
+                            for step in steps:
+                                step_lines.append(
+                                    f"Step {step.get('step')}: "
+                                    f"{step.get('action')} - "
+                                    f"{step.get('description', '')} "
+                                    f"(target: {step.get('element', step.get('target', ''))})"
+                                )
+
+                            file_chunks.append(
+                                Document(
+                                    page_content="\n".join(step_lines),
+                                    metadata={
+                                        "source": source,
+                                        "test_id": test_id,
+                                        "section": "test_steps",
+                                        "tags": ",".join(tags)
+                                    }
+                                )
+                            )
+
+                        # -------- 4. VALIDATION RULES CHUNK (TRUTH) --------
+                        validation = item.get("validation_rules", {})
+                        if validation:
+                            val_lines = [f"Test ID: {test_id}", "Validation Rules:"]
+                            for result_type, rules in validation.items():
+                                val_lines.append(f"{result_type.upper()} CONDITIONS:")
+                                for check in rules.get("manual_checks", []):
+                                    val_lines.append(f"- Manual check: {check}")
+                                for assertion in rules.get("automation_assertions", []):
+                                    val_lines.append(
+                                        f"- Assertion: {assertion.get('assertion_type')} | "
+                                        f"selector: {assertion.get('selector_hint', '')}"
+                                    )
+
+                            file_chunks.append(
+                                Document(
+                                    page_content="\n".join(val_lines),
+                                    metadata={
+                                        "source": source,
+                                        "test_id": test_id,
+                                        "section": "validation_rules",
+                                        "tags": ",".join(tags)
+                                    }
+                                )
+                            )
+
+                        # -------- 5. PRE / POST CONDITIONS CHUNK (WHEN / AFTER) --------
+                        pre = item.get("preconditions", [])
+                        post = item.get("postconditions", [])
+
+                        if pre or post:
+                            cond_lines = [f"Test ID: {test_id}"]
+
+                            if pre:
+                                cond_lines.append("Preconditions:")
+                                for p in pre:
+                                    cond_lines.append(f"- {p}")
+
+                            if post:
+                                cond_lines.append("Postconditions:")
+                                for p in post:
+                                    cond_lines.append(f"- {p}")
+
+                            file_chunks.append(
+                                Document(
+                                    page_content="\n".join(cond_lines),
+                                    metadata={
+                                        "source": source,
+                                        "test_id": test_id,
+                                        "section": "conditions",
+                                        "tags": ",".join(tags)
+                                    }
+                                )
+                            )
+
+                        # -------- 6. METADATA / TAGS CHUNK (RETRIEVAL) --------
+                        meta_content = (
+                            f"Test ID: {test_id}\n"
+                            f"Scope: {scope}\n"
+                            f"Test Type: {test_type}\n"
+                            f"Tags: {', '.join(tags)}"
+                        )
+
+                        file_chunks.append(
+                            Document(
+                                page_content=meta_content,
+                                metadata={
+                                    "source": source,
+                                    "test_id": test_id,
+                                    "section": "metadata",
+                                    "tags": ",".join(tags)
+                                }
+                            )
+                        )
+            return file_chunks # Đã xử lý xong JSON, nhảy sang file tiếp theo
+
+        # ---- XỬ LÝ MD ----
+        # if suffix == ".md":
+        #     with open(file_path, 'r', encoding='utf-8') as f:
+        #         data = f.read()
+        #     # 1. Define the headers to split on (Mapping # Flow and ## STEP to metadata)
+        #     headers_to_split_on = [("#", "flow_id"), ("##", "test_id")]
+
+        #     md_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
+        #     md_header_splits = md_splitter.split_text(data)
+
+        #     # 2. Clean up the 'test_id' (Removing 'STEP 1: ' prefix to match BENCHMARK_SUITE)
+        #     for doc in md_header_splits:
+        #         raw_test_id = doc.metadata.get("test_id", "")
+        #         if ":" in raw_test_id:
+        #             doc.metadata["test_id"] = raw_test_id.split(":")[-1].strip()
+        #         raw_flow_id = doc.metadata.get("flow_id", "")
+        #         if ":" in raw_flow_id:
+        #             doc.metadata["flow_id"] = raw_flow_id.split(":")[-1].strip()
+        #     # Add common metadata
+        #     doc.metadata["source"] = file_path.name
+        #     all_processed_chunks.extend(splitter.split_documents(md_header_splits))
+        #     continue # Đã xử lý xong MD, nhảy sang file tiếp theo
+
+        # ---- XỬ LÝ TXT, CSV... ----
+        docs = [] # Initialize to avoid NameError
+        if suffix in IN_PROCESS_SUFFIXES:
+            loader = TextLoader(str(file_path), encoding="utf-8")
+            docs = loader.load()
+
+        # ---- XỬ LÝ BINARY (PDF, DOCX...) ----
+        else:
+            loader = UnstructuredFileLoader(str(file_path))
+            docs = loader.load()
+
+        # Thêm metadata source cho các file không phải JSON
+        if docs:
+            for d in docs:
+                d.metadata["source"] = source
+            file_chunks.extend(splitter.split_documents(docs))
+
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"⚠️ Skipped {file_path.name}: {e}")
+
+    return file_chunks
+
+
 def load_entire_knowledge_base(
     directory_path: str,
     chunk_size: int = 4000,
@@ -56,210 +283,117 @@ def load_entire_knowledge_base(
             continue
 
         total_files += 1
-        suffix = file_path.suffix.lower()
+        all_processed_chunks.extend(load_file_chunks(file_path, splitter))
 
-        try:
-            # ---- XỬ LÝ RIÊNG FILE JSON (Bóc tách từng Test Case) ----
-            if suffix == ".json":
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                    # Nếu JSON là list test cases
-                    if isinstance(data, list):
-                        for item in data:
-                            test_id = item.get("test_id", "unknown_test")
-                            tags = item.get("tags", [])
-                            scope = item.get("scope", "")
-                            test_type = item.get("test_type", "")
-
-                            # -------- 1. INTENT CHUNK (WHY) --------
-                            intent = item.get("intent", {})
-                            intent_content = (
-                                f"Test ID: {test_id}\n"
-                                f"Intent Summary: {intent.get('summary', '')}\n"
-                                f"Business Value: {intent.get('business_value', '')}\n"
-                                f"Scope: {scope}\n"
-                                f"Test Type: {test_type}"
-                            )
-
-                            all_processed_chunks.append(
-                                Document(
-                                    page_content=intent_content,
-                                    metadata={
-                                        "source": file_path.name,
-                                        "test_id": test_id,
-                                        "section": "intent",
-                                        "scope": scope,
-                                        "tags": ",".join(tags)
-                                    }
-                                )
-                            )
+    print(f"✅ Processed {total_files} files into {len(all_processed_chunks)} chunks.")
+    return all_processed_chunks # Trả về list documents để lưu vào VectorDB
 
-                            # -------- 2. UI ELEMENTS CHUNK (WHAT) --------
-                            ui_elements = item.get("ui_elements", {})
-                            if ui_elements:
-                                ui_lines = [f"Test ID: {test_id}", "UI Elements:"]
-                                for name, el in ui_elements.items():
-                                    ui_lines.append(
-                                        f"- {name} | role: {el.get('role')} | "
-                                        f"purpose: {el.get('purpose')} | "
-                                        f"locators: {', '.join(el.get('locator_hints', []))}"
-                                    )
 
-                                all_processed_chunks.append(
-                                    Document(
-                                        page_content="\n".join(ui_lines),
-                                        metadata={
-                                            "source": file_path.name,
-                                            "test_id": test_id,
-                                            "section": "ui_elements",
-                                            "tags": ",".join(tags)
-                                        }
-                                    )
-                                )
+def _load_file_worker(file_path: str, chunk_size: int, chunk_overlap: int,
+                      source: Optional[str] = None) -> List[Document]:
+    # Runs inside a worker process -> build the splitter there instead of pickling it
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+    return load_file_chunks(Path(file_path), splitter, raise_errors=True, source=source)
 
-                            # -------- 3. TEST STEPS CHUNK (HOW) --------
-                            steps = item.get("test_steps", [])
-                            if steps:
-                                step_lines = [f"Test ID: {test_id}", "Test Steps:"]
-                                for step in steps:
-                                    step_lines.append(
-                                        f"Step {step.get('step')}: "
-                                        f"{step.get('action')} - "
-                                        f"{step.get('description', '')} "
-                                        f"(target: {step.get('element', step.get('target', ''))})"
-                                    )
 
-                                all_processed_chunks.append(
-                                    Document(
-                                        page_content="\n".join(step_lines),
-                                        metadata={
-                                            "source": file_path.name,
-                                            "test_id": test_id,
-                                            "section": "test_steps",
-                                            "tags": ",".join(tags)
-                                        }
-                                    )
-                                )
+def _source(file_path: Path, source_root: Optional[Path]) -> Optional[str]:
+    return Path(file_path).relative_to(source_root).as_posix() if source_root else None
 
-                            # -------- 4. VALIDATION RULES CHUNK (TRUTH) --------
-                            validation = item.get("validation_rules", {})
-                            if validation:
-                                val_lines = [f"Test ID: {test_id}", "Validation Rules:"]
-                                for result_type, rules in validation.items():
-                                    val_lines.append(f"{result_type.upper()} CONDITIONS:")
-                                    for check in rules.get("manual_checks", []):
-                                        val_lines.append(f"- Manual check: {check}")
-                                    for assertion in rules.get("automation_assertions", []):
-                                        val_lines.append(
-                                            f"- Assertion: {assertion.get('assertion_type')} | "
-                                            f"selector: {assertion.get('selector_hint', '')}"
-                                        )
-
-                                all_processed_chunks.append(
-                                    Document(
-                                        page_content="\n".join(val_lines),
-                                        metadata={
-                                            "source": file_path.name,
-                                            "test_id": test_id,
-                                            "section": "validation_rules",
-                                            "tags": ",".join(tags)
-                                        }
-                                    )
-                                )
 
-                            # -------- 5. PRE / POST CONDITIONS CHUNK (WHEN / AFTER) --------
-                            pre = item.get("preconditions", [])
-                            post = item.get("postconditions", [])
-
-                            if pre or post:
-                                cond_lines = [f"Test ID: {test_id}"]
-
-                                if pre:
-                                    cond_lines.append("Preconditions:")
-                                    for p in pre:
-                                        cond_lines.append(f"- {p}")
-
-                                if post:
-                                    cond_lines.append("Postconditions:")
-                                    for p in post:
-                                        cond_lines.append(f"- {p}")
-
-                                all_processed_chunks.append(
-                                    Document(
-                                        page_content="\n".join(cond_lines),
-                                        metadata={
-                                            "source": file_path.name,
-                                            "test_id": test_id,
-                                            "section": "conditions",
-                                            "tags": ",".join(tags)
-                                        }
-                                    )
-                                )
+def _record_failure(file_path: Path, error: Exception, failed_files: Optional[List[Path]]):
+    print(f"⚠️ Skipped {file_path.name}: {error}")
+    if failed_files is not None:
+        failed_files.append(file_path)
 
-                            # -------- 6. METADATA / TAGS CHUNK (RETRIEVAL) --------
-                            meta_content = (
-                                f"Test ID: {test_id}\n"
-                                f"Scope: {scope}\n"
-                                f"Test Type: {test_type}\n"
-                                f"Tags: {', '.join(tags)}"
-                            )
 
-                            all_processed_chunks.append(
-                                Document(
-                                    page_content=meta_content,
-                                    metadata={
-                                        "source": file_path.name,
-                                        "test_id": test_id,
-                                        "section": "metadata",
-                                        "tags": ",".join(tags)
-                                    }
-                                )
-                            )
-                continue # Đã xử lý xong JSON, nhảy sang file tiếp theo
-
-            # ---- XỬ LÝ MD ----
-            # if suffix == ".md":
-            #     with open(file_path, 'r', encoding='utf-8') as f:
-            #         data = f.read()
-            #     # 1. Define the headers to split on (Mapping # Flow and ## STEP to metadata)
-            #     headers_to_split_on = [("#", "flow_id"), ("##", "test_id")]
-
-            #     md_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
-            #     md_header_splits = md_splitter.split_text(data)
-
-            #     # 2. Clean up the 'test_id' (Removing 'STEP 1: ' prefix to match BENCHMARK_SUITE)
-            #     for doc in md_header_splits:
-            #         raw_test_id = doc.metadata.get("test_id", "")
-            #         if ":" in raw_test_id:
-            #             doc.metadata["test_id"] = raw_test_id.split(":")[-1].strip()
-            #         raw_flow_id = doc.metadata.get("flow_id", "")
-            #         if ":" in raw_flow_id:
-            #             doc.metadata["flow_id"] = raw_flow_id.split(":")[-1].strip()
-            #     # Add common metadata
-            #     doc.metadata["source"] = file_path.name
-            #     all_processed_chunks.extend(splitter.split_documents(md_header_splits))
-            #     continue # Đã xử lý xong MD, nhảy sang file tiếp theo
-
-            # ---- XỬ LÝ TXT, CSV... ----
-            docs = [] # Initialize to avoid NameError
-            if suffix in {".txt", ".csv", ".yaml", ".yml"}:
-                loader = TextLoader(str(file_path), encoding="utf-8")
-                docs = loader.load()
-
-            # ---- XỬ LÝ BINARY (PDF, DOCX...) ----
-            else:
-                loader = UnstructuredFileLoader(str(file_path))
-                docs = loader.load()
-
-            # Thêm metadata source cho các file không phải JSON
-            if docs:
-                for d in docs:
-                    d.metadata["source"] = file_path.name
-                all_processed_chunks.extend(splitter.split_documents(docs))
+def stream_files(
+    file_paths: Iterable[Path],
+    chunk_size: int = 4000,
+    chunk_overlap: int = 150,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    failed_files: Optional[List[Path]] = None,
+    source_root: Optional[Path] = None,
+) -> Iterator[Document]:
+    """
+    Yield chunks file by file as soon as each file is parsed.
+    With source_root, chunks get the file path relative to it as 'source' instead of the file name.
+    JSON/TXT/CSV/YAML files are parsed in this process (milliseconds each). Only Unstructured files
+    (PDF, DOCX, ...) are fanned out to a process pool, created on the first such file, and at most
+    max_in_flight of them are submitted at once, so memory stays flat regardless of corpus size.
+    Chunks of one file are always yielded together; file order follows completion order.
+    Files that fail to parse yield nothing and are appended to `failed_files` when it is given.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+    totals = {"files": 0, "chunks": 0}
+    executor = None
+    in_flight = {}
 
+    def _emit(file_path: Path, parse):
+        try:
+            file_chunks = parse()
         except Exception as e:
-            print(f"⚠️ Skipped {file_path.name}: {e}")
+            _record_failure(file_path, e, failed_files)
+            return
+        totals["chunks"] += len(file_chunks)
+        yield from file_chunks
+
+    def _drain(block: bool):
+        # block: wait for at least one parsed file; otherwise only collect the finished ones
+        done = wait(in_flight, return_when=FIRST_COMPLETED)[0] if block else \
+            [future for future in in_flight if future.done()]
+        for future in done:
+            yield from _emit(in_flight.pop(future), future.result)
+
+    try:
+        for file_path in map(Path, file_paths):
+            totals["files"] += 1
+            source = _source(file_path, source_root)
+            if max_workers == 1 or file_path.suffix.lower() in IN_PROCESS_SUFFIXES:
+                yield from _emit(file_path, lambda: load_file_chunks(
+                    file_path, splitter, raise_errors=True, source=source))
+                yield from _drain(block=False)
+                continue
+
+            if executor is None:
+                # spawn, not fork: the caller (RAGStorage) already holds torch/HF threads, and forking a
+                # process with live threads can deadlock the children
+                executor = ProcessPoolExecutor(max_workers=max_workers,
+                                               mp_context=multiprocessing.get_context("spawn"))
+            in_flight[executor.submit(_load_file_worker, str(file_path), chunk_size, chunk_overlap,
+                                      source)] = file_path
+            # Top up the pool without reading the whole file list ahead
+            while len(in_flight) >= max_in_flight:
+                yield from _drain(block=True)
+        while in_flight:
+            yield from _drain(block=True)
+    finally:
+        # Also reached when the consumer stops early -> drop queued work
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    print(f"✅ Streamed {totals['files']} files into {totals['chunks']} chunks.")
+
+
+def stream_knowledge_base(
+    directory_path: str,
+    chunk_size: int = 4000,
+    chunk_overlap: int = 150,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Document]:
+    """Generator variant of load_entire_knowledge_base, see stream_files()."""
+    base_path = Path(directory_path)
+    if not base_path.exists():
+        raise FileNotFoundError(f"Directory not found: {directory_path}")
 
-    print(f"✅ Processed {total_files} files into {len(all_processed_chunks)} chunks.")
-    return all_processed_chunks # Trả về list documents để lưu vào VectorDB
\ No newline at end of file
+    file_paths = (file_path for file_path in base_path.rglob("*") if file_path.is_file())
+    yield from stream_files(file_paths, chunk_size, chunk_overlap, max_workers, max_in_flight)
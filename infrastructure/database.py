@@ -1,4 +1,12 @@
+import asyncio
+import contextlib
+import functools
+import itertools
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_ollama import OllamaEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
@@ -7,16 +15,35 @@ from langchain_core.documents import Document
 from langchain_classic.indexes import SQLRecordManager, index
 from langchain_huggingface import HuggingFaceEmbeddings
 import infrastructure.data_util as data_util
+from infrastructure.context_builder import build_context
+from infrastructure.corpus_manifest import CorpusManifest
+from infrastructure.embedding_cache import CachedEmbeddings
+from infrastructure.ingest_pipeline import IngestionPipeline, PrecomputedVectorStore, format_stage_stats
+from infrastructure.lexical_index import BM25Index, reciprocal_rank_fusion
+from infrastructure.lru_cache import LRUCache
+from infrastructure.metadata_filter import metadata_matches
+from infrastructure.reranker import CrossEncoderReranker
+from infrastructure.semantic_cache import SemanticCache
+
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
 
 
 class RAGStorage:
-    def __init__(self, db_path="./rag_internal_db", record_db="sqlite:///rag_internal_record_manager.db"):
+    def __init__(self, db_path="./rag_internal_db", record_db="sqlite:///rag_internal_record_manager.db",
+                 data_dir="./infrastructure/rag_data_example/md_data", embedding_cache_path="./embedding_cache.db",
+                 index_batch_size=100, embed_batch_size=64, search_workers=4,
+                 query_cache_size=1024, query_cache_ttl=None, search_mode="vector",
+                 rerank=False, rerank_fetch_k=20, rerank_budget_ms=150, semantic_cache_threshold=0.92):
         self.db_path = db_path
-        self.embeddings = HuggingFaceEmbeddings(
-            model="paraphrase-multilingual-MiniLM-L12-v2")
-        gen = data_util.load_entire_knowledge_base(
-            "./infrastructure/rag_data_example/md_data")
-        batch = []
+        self.index_batch_size = index_batch_size
+        self.embed_batch_size = embed_batch_size
+        self.data_dir = data_dir
+        self.search_mode = search_mode # "vector" or "hybrid" (BM25 + vector, fused with RRF)
+        # Wrap the model with the on-disk cache so re-indexing only embeds new text
+        self.embeddings = CachedEmbeddings(
+            HuggingFaceEmbeddings(model=EMBEDDING_MODEL),
+            model_name=EMBEDDING_MODEL,
+            cache_path=embedding_cache_path)
 
         # Initialize the Vector Store with a persistent directory
         self.vector_store = Chroma(
@@ -29,13 +56,39 @@ class RAGStorage:
         namespace = "chroma/internal_knowledge"
         self.record_manager = SQLRecordManager(namespace, db_url=record_db)
         self.record_manager.create_schema()
-        index(
-            gen,
-            self.record_manager,
-            self.vector_store,
-            cleanup="incremental",
-            source_id_key="source"
-        )
+
+        # Repeated queries skip both the query embedding and the HNSW lookup.
+        # Result cache is cleared whenever index() changes the collection (see _on_corpus_changed)
+        self.corpus_version = 0
+        self._query_embedding_cache = LRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        self._result_cache = LRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        # Final MANUAL/GENERAL answers keyed by query embedding, stamped with corpus_version
+        self.semantic_cache = SemanticCache(threshold=semantic_cache_threshold)
+
+        # Optional cross-encoder second pass (CPU), loaded lazily unless reranking is on by default
+        self.rerank = rerank
+        self.rerank_fetch_k = rerank_fetch_k
+        self.rerank_budget_ms = rerank_budget_ms
+        self.reranker = CrossEncoderReranker()
+        if self.rerank:
+            self.reranker.warmup()
+
+        # Lexical side of hybrid search, mirrors the Chroma collection (synced by chunk id).
+        # Loaded on the first hybrid query so startup stays independent of the corpus size
+        self.lexical_index = BM25Index()
+        # test_id -> chunk ids of that test case, used to expand hits into whole test cases
+        self._test_id_index = {}
+        self._lexical_ready = False
+        self._lexical_lock = threading.Lock()
+
+        # Manifest lives inside the vector store folder so wiping the DB also forces a full re-index
+        self.manifest = CorpusManifest(
+            os.path.join(self.db_path, "corpus_manifest.json"), self.data_dir)
+        self.sync_knowledge_base()
+
+        # Bounded pool for asearch_documents: caps concurrent embedding/HNSW work across sessions
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=search_workers, thread_name_prefix="rag-search")
 
         # if len(self.vector_store.get()['ids']) == 0:
         #     # Load initial data using the deduplication logic
@@ -98,10 +151,243 @@ Code: await expect(page).toHaveURL(/.*my-account/);""",
         # If 'num_added' is 0, it means the document already existed and was skipped.
         print(f"Indexing complete: {indexing_result}")
 
-    def search_documents(self, query: str):
+    def sync_knowledge_base(self):
+        """
+        Re-index only the files whose fingerprint changed since the last run.
+        With an unchanged corpus no file is opened and index() is not called at all.
+        """
+        changed_files, removed_sources = self.manifest.scan()
+        if not changed_files and not removed_sources:
+            print("--- [RAG Index] Knowledge base unchanged, skipping ingestion ---")
+            self.manifest.commit()
+            return None
+
+        indexed_sources = set()
+        failed_files = []
+
+        def _track_sources(chunks):
+            # closing(): an early stop of the pipeline also shuts down the parser pool of `chunks`
+            with contextlib.closing(chunks):
+                for chunk in chunks:
+                    indexed_sources.add(chunk.metadata.get("source"))
+                    yield chunk
+
+        # Chunks are streamed from the parser pool through the embed stage into index(),
+        # so the model keeps embedding while Chroma / record manager writes happen
+        gen = data_util.stream_files(
+            changed_files, max_workers=max(1, min(len(changed_files), os.cpu_count() or 1)),
+            failed_files=failed_files, source_root=self.manifest.directory_path)
+        # Batches end on file boundaries: 'incremental' cleanup runs per index() batch and would
+        # otherwise delete (and re-embed) the not-yet-seen chunks of a file split across two batches
+        pipeline = IngestionPipeline(self.embeddings, embed_batch_size=self.embed_batch_size, group_key="source")
+        indexing_result, stage_stats = pipeline.run(_track_sources(gen), self._index_batches)
+
+        # 'incremental' cleanup only touches sources present in the batch,
+        # so chunks of deleted (or now empty) files must be removed explicitly.
+        # A file that failed to parse keeps its old chunks (also under a legacy file-name source)
+        # and is retried on the next sync.
+        failed_sources = {self.manifest.source(path) for path in failed_files}
+        kept_legacy = {path.name for path in failed_files} & self.manifest.legacy_sources
+        stale_sources = (set(removed_sources) - kept_legacy) | {
+            self.manifest.source(path) for path in changed_files
+            if self.manifest.source(path) not in indexed_sources | failed_sources}
+        indexing_result["num_deleted"] += self._delete_sources(stale_sources)
+
+        self.manifest.discard(failed_files)
+        self.manifest.commit()
+        if indexing_result["num_added"] or indexing_result["num_updated"] or indexing_result["num_deleted"]:
+            self._on_corpus_changed()
+        print(f"--- [RAG Index] {len(changed_files)} changed file(s): {indexing_result} ---")
+        if failed_files:
+            print(f"--- [RAG Index] {len(failed_files)} file(s) failed to parse, will retry: "
+                  f"{sorted(failed_sources)} ---")
+        print(f"--- [RAG Ingestion] {format_stage_stats(stage_stats)} ---")
+        print(f"--- [Embedding Cache] {self.embeddings.stats()} ---")
+        return indexing_result
+
+    def _index_batches(self, batches) -> dict:
+        """
+        index() the file-aligned pipeline batches, about index_batch_size chunks per call.
+        The vectors from the embedding stage are upserted as-is (PrecomputedVectorStore).
+        """
+        totals = {"num_added": 0, "num_updated": 0, "num_skipped": 0, "num_deleted": 0}
+        destination = PrecomputedVectorStore(self.vector_store)
+        pending = []
+        for item in itertools.chain(batches, [None]):
+            if item is not None:
+                batch, vectors = item
+                destination.prime(batch, vectors)
+                pending.extend(batch)
+                if len(pending) < self.index_batch_size:
+                    continue
+            if not pending:
+                break
+            result = index(
+                pending,
+                self.record_manager,
+                destination,
+                cleanup="incremental",
+                source_id_key="source",
+                batch_size=len(pending)
+            )
+            for key in totals:
+                totals[key] += result.get(key, 0)
+            destination.clear()
+            pending = []
+        return totals
+
+    def _delete_sources(self, sources) -> int:
+        deleted = 0
+        for source in sources:
+            uids = self.record_manager.list_keys(group_ids=[source])
+            if uids:
+                self.vector_store.delete(uids)
+                self.record_manager.delete_keys(uids)
+                deleted += len(uids)
+        return deleted
+
+    def _on_corpus_changed(self):
+        self.corpus_version += 1
+        self._result_cache.clear()
+        if self._lexical_ready:
+            with self._lexical_lock:
+                self._sync_lexical_index()
+
+    def _ensure_lexical_index(self):
+        if not self._lexical_ready:
+            with self._lexical_lock:
+                if not self._lexical_ready:
+                    self._sync_lexical_index()
+                    self._lexical_ready = True
+
+    def _sync_lexical_index(self):
+        """Apply the id diff between Chroma and the BM25 index, only new chunks are fetched."""
+        stored_ids = set(self.vector_store.get(include=[])["ids"])
+        known_ids = self.lexical_index.ids()
+        for doc_id in known_ids - stored_ids:
+            test_id = self.lexical_index.documents[doc_id].metadata.get("test_id")
+            if test_id in self._test_id_index:
+                self._test_id_index[test_id].discard(doc_id)
+                if not self._test_id_index[test_id]:
+                    del self._test_id_index[test_id]
+            self.lexical_index.remove(doc_id)
+
+        new_ids = list(stored_ids - known_ids)
+        for i in range(0, len(new_ids), 1000):
+            batch = self.vector_store.get(ids=new_ids[i:i + 1000], include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                self.lexical_index.add(doc_id, Document(id=doc_id, page_content=text, metadata=metadata or {}))
+                if metadata and metadata.get("test_id"):
+                    self._test_id_index.setdefault(metadata["test_id"], set()).add(doc_id)
+
+    def get_test_case_chunks(self, test_id: str):
+        """
+        All chunks (intent, ui_elements, test_steps, ...) of one test case: from memory once the lexical
+        index is loaded, otherwise with one filtered Chroma read.
+        """
+        if self._lexical_ready:
+            return [self.lexical_index.documents[doc_id] for doc_id in self._test_id_index.get(test_id, ())]
+        batch = self.vector_store.get(where={"test_id": test_id}, include=["documents", "metadatas"])
+        return [Document(id=doc_id, page_content=text, metadata=metadata or {})
+                for doc_id, text, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"])]
+
+    def build_context(self, hits, token_budget: int = 1500, max_test_cases: int = 2, where: dict = None) -> str:
+        """
+        Render search hits as whole test cases under a token budget (see context_builder).
+        Pass the `where` filter of the search so the expansion stays inside it.
+        """
+        return build_context(hits, self.get_test_case_chunks,
+                             token_budget=token_budget, max_test_cases=max_test_cases, where=where)
+
+    def embed_query(self, query: str):
+        embedding = self._query_embedding_cache.get(query)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+            self._query_embedding_cache.put(query, embedding)
+        return embedding
+
+    def search_documents(self, query: str, k: int = 3, mode: str = None, where: dict = None,
+                         rerank: bool = None):
+        """
+        `where` is a Chroma metadata filter (see metadata_filter.build_where_filter), pushed down into
+        the HNSW search instead of over-fetching and filtering the results afterwards.
+        With `rerank`, rerank_fetch_k candidates are rescored by the cross-encoder within rerank_budget_ms.
+        """
+        started_at = time.perf_counter()
+        mode = mode or self.search_mode
+        rerank = self.rerank if rerank is None else rerank
+        cache_key = (query, k, mode, json.dumps(where, sort_keys=True) if where else None, rerank)
+        results = self._result_cache.get(cache_key)
+        if results is not None:
+            print(f"--- [RAG Search] Cache hit for user's query: {query} ---")
+            return list(results)
+
         print(f"--- [RAG Search] Finding data for user's query: {query} ---")
-        results = self.vector_store.similarity_search(query, k=3)
-        return results
+        fetch_k = max(k, self.rerank_fetch_k) if rerank else k
+        if mode == "hybrid":
+            results = self._hybrid_search(query, fetch_k, where)
+        else:
+            results = self.vector_store.similarity_search_by_vector(self.embed_query(query), k=fetch_k, filter=where)
+
+        complete = True
+        if rerank:
+            results, info = self.reranker.rerank_with_info(
+                query, results, top_k=k, deadline=started_at + self.rerank_budget_ms / 1000)
+            # A rerank cut short by the latency budget is not cached: the next call may have time for it
+            complete = info["complete"]
+        if complete:
+            self._result_cache.put(cache_key, results)
+        return list(results)
+
+    def _hybrid_search(self, query: str, k: int, where: dict = None, rrf_k: int = 60):
+        """Dense top-N and BM25 top-N fused with reciprocal rank fusion."""
+        self._ensure_lexical_index()
+        fetch_k = max(k * 4, 20)
+        vector_hits = self.vector_store.similarity_search_by_vector(
+            self.embed_query(query), k=fetch_k, filter=where)
+        lexical_hits = self.lexical_index.search(
+            query, k=fetch_k,
+            doc_filter=(lambda doc: metadata_matches(doc.metadata, where)) if where else None)
+
+        docs_by_id = {doc_id: self.lexical_index.documents[doc_id] for doc_id, _ in lexical_hits}
+        vector_ids = []
+        for doc in vector_hits:
+            doc_id = doc.id or doc.page_content
+            docs_by_id.setdefault(doc_id, doc)
+            vector_ids.append(doc_id)
+
+        fused_ids = reciprocal_rank_fusion([vector_ids, [doc_id for doc_id, _ in lexical_hits]], k=rrf_k)
+        return [docs_by_id[doc_id] for doc_id in fused_ids[:k]]
+
+    def cache_stats(self) -> dict:
+        return {
+            "query_embeddings": self._query_embedding_cache.stats(),
+            "results": self._result_cache.stats(),
+            "semantic_answers": self.semantic_cache.stats(),
+        }
+
+    async def asearch_documents(self, query: str, k: int = 3, mode: str = None, where: dict = None,
+                                rerank: bool = None, timeout: float = None):
+        """
+        Non-blocking search_documents for the async graph nodes.
+        Query embedding + HNSW lookup run on a bounded thread pool so the event loop (other sessions,
+        Playwright driver) keeps running. Cancelling the caller drops the search if it has not started yet;
+        a running search finishes in the background and its result is discarded.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._search_executor, functools.partial(self.search_documents, query, k, mode, where, rerank))
+        if timeout:
+            return await asyncio.wait_for(future, timeout)
+        return await future
+
+    async def aembed_query(self, query: str):
+        """embed_query on the search pool (MiniLM inference would otherwise block the event loop)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._search_executor, self.embed_query, query)
+
+    def close(self):
+        self._search_executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed, on-disk cache around any LangChain Embeddings object.
+    Vectors are keyed by (model name, sha256 of chunk text) in SQLite, so rebuilding a store
+    only computes vectors for text that was never embedded before.
+    The least recently used entries are evicted once max_entries is exceeded.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str,
+                 cache_path: str = "./embedding_cache.db", max_entries: int = 200_000):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+
+        with self._lock:
+            cached = {}
+            # Stay below SQLite's bound-parameter limit
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                cached.update({key: array("f", blob).tolist() for key, blob in rows})
+            if cached:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in cached])
+                self._conn.commit()
+
+        missing_keys = [key for key in unique_keys if key not in cached]
+        self.hits += len(texts) - sum(1 for key in keys if key not in cached)
+        self.misses += len(missing_keys)
+
+        if missing_keys:
+            text_by_key = dict(zip(keys, texts))
+            vectors = self.underlying.embed_documents([text_by_key[key] for key in missing_keys])
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                    [(key, array("f", vector).tobytes(), now) for key, vector in zip(missing_keys, vectors)])
+                self._size += len(missing_keys)
+                self._evict()
+                self._conn.commit()
+            cached.update({key: list(vector) for key, vector in zip(missing_keys, vectors)})
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries are rarely repeated verbatim across runs, don't pollute the document cache
+        return self.underlying.embed_query(text)
+
+    def _evict(self):
+        overflow = self._size - self.max_entries
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)", (overflow,))
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._size,
+        }
@@ -0,0 +1,215 @@
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+_DONE = object()
+
+
+class _StageFailed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class IngestionPipeline:
+    """
+    Three overlapping ingestion stages connected by bounded queues:
+    1. chunking  - pulls chunks from the (process pool) loader and groups them into batches
+    2. embedding - embeds each batch through the CachedEmbeddings
+    3. upsert    - the sink receives (batch, vectors) pairs and writes them to Chroma + record manager
+                   with the precomputed vectors (see PrecomputedVectorStore), nothing is embedded twice
+    While stage 3 is busy with SQLite writes, stage 2 is already embedding the next batch.
+    With group_key (e.g. "source"), a batch is only closed where that metadata value changes, so
+    consecutive chunks of one file never end up in two batches (batches may exceed embed_batch_size).
+    """
+
+    def __init__(self, embeddings: Embeddings, embed_batch_size: int = 64, max_queued_batches: int = 4,
+                 group_key: Optional[str] = None):
+        self.embeddings = embeddings
+        self.embed_batch_size = embed_batch_size
+        self.max_queued_batches = max_queued_batches
+        self.group_key = group_key
+
+    def _boundary(self, previous: Document, chunk: Document) -> bool:
+        if self.group_key is None:
+            return True
+        return previous.metadata.get(self.group_key) != chunk.metadata.get(self.group_key)
+
+    def run(self, chunks: Iterable[Document],
+            sink: Callable[[Iterator[Tuple[List[Document], List[List[float]]]]], dict]):
+        """
+        Push chunks through the pipeline. `sink` receives an iterator of (batch, vectors) pairs and its
+        return value is passed back together with per-stage throughput stats.
+        If the sink stops early or fails, the `chunks` generator is closed (which shuts down the
+        loader's process pool) before run() returns.
+        """
+        chunk_queue = queue.Queue(maxsize=self.max_queued_batches)
+        embed_queue = queue.Queue(maxsize=self.max_queued_batches)
+        stop = threading.Event()
+        stats = {name: {"chunks": 0, "seconds": 0.0} for name in ("chunking", "embedding", "upsert")}
+
+        def _put(q, item):
+            # Bounded put that gives up once the consumer side has failed
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def _chunk_stage():
+            iterator = iter(chunks)
+            try:
+                batch = []
+                while True:
+                    start = time.perf_counter()
+                    chunk = next(iterator, _DONE)
+                    stats["chunking"]["seconds"] += time.perf_counter() - start
+                    if chunk is _DONE:
+                        break
+                    if len(batch) >= self.embed_batch_size and self._boundary(batch[-1], chunk):
+                        if not _put(chunk_queue, batch):
+                            return
+                        batch = []
+                    batch.append(chunk)
+                    stats["chunking"]["chunks"] += 1
+                if batch:
+                    _put(chunk_queue, batch)
+                _put(chunk_queue, _DONE)
+            except BaseException as e:
+                _put(chunk_queue, _StageFailed(e))
+            finally:
+                # Runs the generator's cleanup (e.g. stream_files shuts its pool down) on early stop too
+                close = getattr(iterator, "close", None)
+                if close:
+                    close()
+
+        def _embed_stage():
+            try:
+                while True:
+                    batch = _get(chunk_queue)
+                    if batch is _DONE or isinstance(batch, _StageFailed):
+                        _put(embed_queue, batch)
+                        return
+                    start = time.perf_counter()
+                    vectors = self.embeddings.embed_documents([doc.page_content for doc in batch])
+                    stats["embedding"]["seconds"] += time.perf_counter() - start
+                    stats["embedding"]["chunks"] += len(batch)
+                    if not _put(embed_queue, (batch, vectors)):
+                        return
+            except BaseException as e:
+                _put(embed_queue, _StageFailed(e))
+
+        wait_seconds = 0.0
+
+        def _embedded_batches():
+            nonlocal wait_seconds
+            while True:
+                start = time.perf_counter()
+                item = embed_queue.get()
+                wait_seconds += time.perf_counter() - start
+                if item is _DONE:
+                    return
+                if isinstance(item, _StageFailed):
+                    raise item.error
+                stats["upsert"]["chunks"] += len(item[0])
+                yield item
+
+        workers = [
+            threading.Thread(target=_chunk_stage, name="ingest-chunking", daemon=True),
+            threading.Thread(target=_embed_stage, name="ingest-embedding", daemon=True),
+        ]
+        started_at = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        try:
+            result = sink(_embedded_batches())
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        wall_seconds = time.perf_counter() - started_at
+        # Upsert busy time = time spent inside the sink minus time it waited for embedded batches
+        stats["upsert"]["seconds"] = max(wall_seconds - wait_seconds, 0.0)
+
+        for stage in stats.values():
+            stage["chunks_per_sec"] = stage["chunks"] / stage["seconds"] if stage["seconds"] else 0.0
+        stats["wall_seconds"] = wall_seconds
+        stats["chunks_per_sec"] = stats["upsert"]["chunks"] / wall_seconds if wall_seconds else 0.0
+        return result, stats
+
+
+class PrecomputedVectorStore(VectorStore):
+    """
+    Write view of a Chroma store for index(): add_documents() upserts the vectors primed from the
+    pipeline's embedding stage instead of embedding the text again. A text that was not primed falls
+    back to the store's embedding function. Reads go to the wrapped store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._vectors = {}
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.store.embeddings
+
+    def prime(self, documents: List[Document], vectors: List[List[float]]):
+        self._vectors.update((doc.page_content, vector) for doc, vector in zip(documents, vectors))
+
+    def clear(self):
+        self._vectors = {}
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = [doc.page_content for doc in documents]
+        missing = list(dict.fromkeys(text for text in texts if text not in self._vectors))
+        if missing:
+            self._vectors.update(zip(missing, self.store.embeddings.embed_documents(missing)))
+        ids = list(ids) if ids else [doc.id or str(uuid.uuid4()) for doc in documents]
+        self.store._collection.upsert(
+            ids=ids,
+            embeddings=[self._vectors[text] for text in texts],
+            documents=texts,
+            metadatas=[doc.metadata or None for doc in documents])
+        return ids
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        return self.add_documents(
+            [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)], **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs):
+        return self.store.delete(ids, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return self.store.similarity_search(query, k=k, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, **kwargs) -> "PrecomputedVectorStore":
+        """Build the wrapped Chroma store from texts (kwargs go to Chroma.from_texts) and wrap it."""
+        from langchain_chroma import Chroma
+        return cls(Chroma.from_texts(texts, embedding, metadatas=metadatas, ids=ids, **kwargs))
+
+
+def format_stage_stats(stats: dict) -> str:
+    return " | ".join(
+        f"{name}: {stats[name]['chunks']} chunks in {stats[name]['seconds']:.2f}s "
+        f"({stats[name]['chunks_per_sec']:.1f}/s)"
+        for name in ("chunking", "embedding", "upsert")
+    ) + f" | wall: {stats['wall_seconds']:.2f}s ({stats['chunks_per_sec']:.1f}/s)"
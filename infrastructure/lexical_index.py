@@ -0,0 +1,146 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Keeps identifiers such as ae_login_flow, #login-email or billing_first_name as one token
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-.:]\w+)*")
+_SPLIT_PATTERN = re.compile(r"[_\-.:]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; compound identifiers also emit their parts (ae_login_flow -> ae, login, flow)."""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = [part for part in _SPLIT_PATTERN.split(token) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+    Documents can be added/removed one by one, so it is kept in sync with Chroma incrementally.
+    search() keeps query latency independent of the corpus size:
+    - terms with an IDF below min_idf (found in almost every chunk, e.g. "test", "id") are skipped,
+      their contribution to the ranking is about 0
+    - each term's postings are kept sorted by the term's BM25 contribution and only the best
+      k * postings_per_result of them are read (impact-ordered early termination). Rare terms such
+      as exact identifiers are read in full, so their matches are scored exactly; documents past the
+      cut-off of a common term miss only that term's (small) contribution.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, min_idf: float = 0.1, postings_per_result: int = 10):
+        self.k1 = k1
+        self.b = b
+        self.min_idf = min_idf
+        self.postings_per_result = postings_per_result
+        self.documents: Dict[str, Document] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        # Per-document BM25 length normalisation, rebuilt lazily after add/remove
+        self._norms: Optional[Dict[str, float]] = None
+        # term -> [(tf part of the BM25 score, doc_id)], best first; built per term on first use
+        self._impacts: Dict[str, List[Tuple[float, str]]] = {}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def ids(self) -> set:
+        return set(self.documents)
+
+    def add(self, doc_id: str, document: Document):
+        if doc_id in self.documents:
+            self.remove(doc_id)
+        terms = Counter(tokenize(document.page_content))
+        self.documents[doc_id] = document
+        self._doc_terms[doc_id] = terms
+        self._doc_lengths[doc_id] = sum(terms.values())
+        self._total_length += self._doc_lengths[doc_id]
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._norms = None
+        self._impacts = {}
+
+    def remove(self, doc_id: str):
+        if doc_id not in self.documents:
+            return
+        terms = self._doc_terms.pop(doc_id)
+        del self.documents[doc_id]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._norms = None
+        self._impacts = {}
+
+    def _get_norms(self) -> Dict[str, float]:
+        if self._norms is None:
+            avg_length = self._total_length / len(self.documents) or 1.0
+            self._norms = {
+                doc_id: self.k1 * (1 - self.b + self.b * length / avg_length)
+                for doc_id, length in self._doc_lengths.items()
+            }
+        return self._norms
+
+    def _get_impacts(self, term: str) -> List[Tuple[float, str]]:
+        impacts = self._impacts.get(term)
+        if impacts is None:
+            norms = self._get_norms()
+            k1_plus_1 = self.k1 + 1
+            impacts = sorted(((tf * k1_plus_1 / (tf + norms[doc_id]), doc_id)
+                              for doc_id, tf in self._postings[term].items()), reverse=True)
+            self._impacts[term] = impacts
+        return impacts
+
+    def search(self, query: str, k: int = 10,
+               doc_filter: Optional[Callable[[Document], bool]] = None) -> List[Tuple[str, float]]:
+        """Return up to k (doc_id, score) pairs, best first."""
+        num_docs = len(self.documents)
+        if not num_docs or k <= 0:
+            return []
+        terms = []
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings:
+                idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                terms.append((idf, term))
+        if not terms:
+            return []
+        # A query made only of ubiquitous terms still ranks by the rarest of them
+        terms = [term for term in terms if term[0] >= self.min_idf] or [max(terms)]
+
+        depth = k * self.postings_per_result
+        scores: Dict[str, float] = {}
+        allowed: Dict[str, bool] = {}
+        for idf, term in terms:
+            read = 0
+            for impact, doc_id in self._get_impacts(term):
+                if doc_filter:
+                    if doc_id not in allowed:
+                        allowed[doc_id] = doc_filter(self.documents[doc_id])
+                    if not allowed[doc_id]:
+                        continue
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * impact
+                read += 1
+                if read >= depth:
+                    break
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[str]:
+    """Fuse several ranked id lists: score(id) = sum(1 / (k + rank))."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,65 @@
+from typing import Iterable, Optional, Union
+
+
+def build_where_filter(
+    sections: Optional[Iterable[str]] = None,
+    test_id: Optional[Union[str, Iterable[str]]] = None,
+    scope: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Build a Chroma `where` clause from the metadata data_util stamps on every chunk.
+    Returns None when no filter is requested (Chroma rejects an empty dict).
+    """
+    clauses = []
+    if sections:
+        clauses.append({"section": {"$in": list(sections)}})
+    if test_id:
+        if isinstance(test_id, str):
+            clauses.append({"test_id": {"$eq": test_id}})
+        else:
+            clauses.append({"test_id": {"$in": list(test_id)}})
+    if scope:
+        clauses.append({"scope": {"$eq": scope}})
+
+    if not clauses:
+        return None
+    # Chroma requires at least two clauses inside $and
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def metadata_matches(metadata: dict, where: Optional[dict]) -> bool:
+    """Evaluate a Chroma `where` clause in Python (used by the in-memory BM25 side of hybrid search)."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(metadata_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(metadata_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, expected in condition.items():
+                if operator == "$eq" and value != expected:
+                    return False
+                if operator == "$ne" and value == expected:
+                    return False
+                if operator == "$in" and value not in expected:
+                    return False
+                if operator == "$nin" and value in expected:
+                    return False
+                if operator in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if operator == "$gt" and not value > expected:
+                        return False
+                    if operator == "$gte" and not value >= expected:
+                        return False
+                    if operator == "$lt" and not value < expected:
+                        return False
+                    if operator == "$lte" and not value <= expected:
+                        return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
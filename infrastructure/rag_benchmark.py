@@ -0,0 +1,246 @@
+"""
+Retrieval benchmark harness for RAGStorage.
+
+1. Generates a synthetic corpus of test cases in the data_util JSON schema (~6 chunks per test case)
+   plus a labeled query set (natural-language + exact-identifier queries with the expected test_id).
+2. Builds a RAGStorage over it (reusing --work-dir makes the rebuild incremental).
+3. Reports build time, memory, sequential latency p50/p95/p99, QPS under concurrency, recall@k and MRR
+   per search mode, as JSON so regressions can be diffed between commits.
+
+Usage: python -m infrastructure.rag_benchmark --chunks 10000 --out bench_output.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from infrastructure.stats_util import percentile
+
+try:
+    import resource
+except ImportError:  # Windows: memory is not reported
+    resource = None
+
+DOMAINS = ["login", "cart", "checkout", "payment", "search", "profile", "wishlist", "review",
+           "shipping", "coupon", "newsletter", "contact", "invoice", "subscription", "returns"]
+ACTIONS = ["verify", "validate", "complete", "update", "cancel", "submit", "browse", "filter"]
+FIELDS = ["email", "password", "name", "address", "city", "zip", "phone", "card_number", "cvc",
+          "quantity", "coupon_code", "message", "country", "state", "company"]
+CHUNKS_PER_TEST_CASE = 6
+
+
+def _make_test_case(index: int, rng: random.Random) -> dict:
+    domain = DOMAINS[index % len(DOMAINS)]
+    action = rng.choice(ACTIONS)
+    fields = rng.sample(FIELDS, 3)
+    test_id = f"syn_{domain}_{index:06d}"
+    ui_elements = {
+        f"{field}_input": {
+            "role": "INPUT",
+            "purpose": f"{field.replace('_', ' ')} for {domain}",
+            "locator_hints": [f"#{domain}-{field}-{index}", f"input[name='{field}_{index}']"],
+        }
+        for field in fields
+    }
+    ui_elements["submit_button"] = {
+        "role": "BUTTON",
+        "purpose": f"Submit the {domain} form",
+        "locator_hints": [f"button[data-qa='{domain}-submit-{index}']"],
+    }
+    return {
+        "schema_version": "1.0",
+        "test_id": test_id,
+        "test_type": rng.choice(["E2E", "FUNCTIONAL", "REGRESSION"]),
+        "scope": domain.capitalize(),
+        "intent": {
+            "summary": f"{action.capitalize()} that the user can {action} the {domain} flow "
+                       f"with {', '.join(field.replace('_', ' ') for field in fields)}.",
+            "business_value": f"Protects revenue of the {domain} feature (variant {index}).",
+        },
+        "preconditions": [f"User is on the {domain} page", "Application is reachable"],
+        "ui_elements": ui_elements,
+        "test_steps": [
+            {"step": i + 1, "action": "FILL", "description": f"Enter {field.replace('_', ' ')}",
+             "element": f"{field}_input"}
+            for i, field in enumerate(fields)
+        ] + [{"step": len(fields) + 1, "action": "CLICK", "description": f"Submit {domain}",
+              "element": "submit_button"}],
+        "validation_rules": {
+            "success": {
+                "manual_checks": [f"{domain.capitalize()} confirmation is displayed"],
+                "automation_assertions": [
+                    {"assertion_type": "VISIBLE", "selector_hint": f"text={domain} success {index}"}],
+            }
+        },
+        "postconditions": [f"{domain.capitalize()} state is persisted"],
+        "tags": [domain, action, "synthetic"],
+    }
+
+
+def generate_synthetic_corpus(directory: Path, num_test_cases: int, cases_per_file: int = 50,
+                              seed: int = 42) -> List[dict]:
+    """Write test cases as JSON files and return a labeled query set [{query, expected_id, kind}]."""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    queries = []
+    batch = []
+    for index in range(num_test_cases):
+        test_case = _make_test_case(index, rng)
+        batch.append(test_case)
+        # Label 1 test case in 20 with one semantic and one exact-identifier query
+        if index % 20 == 0:
+            domain = test_case["scope"].lower()
+            fields = [name[:-len("_input")] for name in test_case["ui_elements"] if name.endswith("_input")]
+            queries.append({
+                "query": f"How do I {test_case['intent']['summary'].split(' ')[0].lower()} the {domain} flow "
+                         f"entering {fields[0].replace('_', ' ')} (variant {index})?",
+                "expected_id": test_case["test_id"],
+                "kind": "semantic",
+            })
+            queries.append({
+                "query": f"Which test uses locator #{domain}-{fields[1]}-{index}?",
+                "expected_id": test_case["test_id"],
+                "kind": "identifier",
+            })
+        if len(batch) >= cases_per_file:
+            _write_file(directory, index // cases_per_file, batch)
+            batch = []
+    if batch:
+        _write_file(directory, num_test_cases // cases_per_file, batch)
+    return queries
+
+
+def _write_file(directory: Path, file_index: int, test_cases: List[dict]):
+    with open(directory / f"synthetic_{file_index:05d}.json", "w", encoding="utf-8") as f:
+        json.dump(test_cases, f)
+
+
+def _max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def score_retrieval(queries: List[dict], results: List[List], k: int) -> dict:
+    recall_hits = 0
+    reciprocal_ranks = 0.0
+    for query, docs in zip(queries, results):
+        retrieved_ids = [doc.metadata.get("test_id") for doc in docs[:k]]
+        if query["expected_id"] in retrieved_ids:
+            recall_hits += 1
+            reciprocal_ranks += 1.0 / (retrieved_ids.index(query["expected_id"]) + 1)
+    return {
+        f"recall@{k}": recall_hits / len(queries) if queries else 0.0,
+        "mrr": reciprocal_ranks / len(queries) if queries else 0.0,
+    }
+
+
+async def _measure_qps(storage, queries: List[dict], k: int, mode: str, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(query):
+        async with semaphore:
+            await storage.asearch_documents(query["query"], k=k, mode=mode)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(query) for query in queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def run_benchmark(num_chunks: int, work_dir: Path, k: int = 3, modes=("vector", "hybrid"),
+                  concurrency_levels=(1, 4, 16), rerank: bool = False, seed: int = 42) -> dict:
+    from infrastructure.database import RAGStorage
+
+    num_test_cases = max(num_chunks // CHUNKS_PER_TEST_CASE, 1)
+    data_dir = work_dir / "data"
+    queries = generate_synthetic_corpus(data_dir, num_test_cases, seed=seed)
+
+    rss_before = _max_rss_mb()
+    start = time.perf_counter()
+    # query_cache_size=0: every query really embeds and hits the index
+    storage = RAGStorage(
+        db_path=str(work_dir / "db"),
+        record_db=f"sqlite:///{work_dir / 'records.db'}",
+        data_dir=str(data_dir),
+        embedding_cache_path=str(work_dir / "embedding_cache.db"),
+        query_cache_size=0,
+        search_workers=max(concurrency_levels),
+        rerank=rerank)
+    build_seconds = time.perf_counter() - start
+
+    report = {
+        "commit": _git_commit(),
+        "params": {"chunks": num_chunks, "test_cases": num_test_cases, "queries": len(queries), "k": k,
+                   "rerank": rerank, "seed": seed},
+        "build": {
+            "seconds": build_seconds,
+            "indexed_chunks": storage.vector_store._collection.count(),
+            "max_rss_mb": _max_rss_mb(),
+            "rss_growth_mb": _max_rss_mb() - rss_before if rss_before is not None else None,
+        },
+        "modes": {},
+    }
+
+    for mode in modes:
+        latencies = []
+        results = []
+        for query in queries:
+            start = time.perf_counter()
+            results.append(storage.search_documents(query["query"], k=k, mode=mode))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        mode_report = {
+            # End-to-end per query: query embedding + search (+ rerank)
+            "latency_ms": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+                           "p99": percentile(latencies, 99)},
+            "qps": {str(level): asyncio.run(_measure_qps(storage, queries, k, mode, level))
+                    for level in concurrency_levels},
+        }
+        mode_report.update(score_retrieval(queries, results, k))
+        for kind in ("semantic", "identifier"):
+            subset = [(q, r) for q, r in zip(queries, results) if q["kind"] == kind]
+            mode_report[kind] = score_retrieval([q for q, _ in subset], [r for _, r in subset], k)
+        report["modes"][mode] = mode_report
+
+    storage.close()
+    return report
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000, help="Approximate corpus size in chunks (1k-100k)")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=["vector", "hybrid"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--rerank", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", help="Reuse a work dir to skip re-embedding between runs")
+    parser.add_argument("--out", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="rag_bench_"))
+    report = run_benchmark(args.chunks, work_dir, k=args.k, modes=args.modes,
+                           concurrency_levels=args.concurrency, rerank=args.rerank, seed=args.seed)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """
+    Second-pass scoring of retrieval candidates with a small local cross-encoder (CPU only).
+    All (query, candidate) pairs are scored in a single batched forward pass.
+    A latency budget is enforced from the measured cost per pair: when the deadline is at risk the
+    candidate list is truncated, and when not even top_k candidates fit the rerank is skipped.
+    Safe to share between the search threads: model loading and forward passes are serialized.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, max_length: int = 256):
+        self.model_name = model_name
+        self.max_length = max_length
+        self._model = None
+        # Cost model of one forward pass, seeded by warmup() and tracked with a moving average
+        self._overhead_seconds: Optional[float] = None
+        self._seconds_per_pair: Optional[float] = None
+        self.last_info: dict = {}
+        self._lock = threading.Lock()
+
+    def warmup(self):
+        """Load the model and measure its per-pair cost so the first real query can respect the budget."""
+        with self._lock:
+            if self._model is None:
+                # sentence-transformers is already installed with langchain_huggingface
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device="cpu", max_length=self.max_length)
+        # Two-point fit: fixed cost of a forward pass + marginal cost per pair
+        _, one_pair = self._predict([("warmup query", "warmup passage")])
+        _, eight_pairs = self._predict([("warmup query", "warmup passage")] * 8)
+        self._seconds_per_pair = max((eight_pairs - one_pair) / 7, 1e-5)
+        self._overhead_seconds = max(one_pair - self._seconds_per_pair, 0.0)
+
+    def _predict(self, pairs: List[Tuple[str, str]]):
+        # The torch model is not thread-safe; the timing covers only the forward pass, not the wait
+        with self._lock:
+            start = time.perf_counter()
+            scores = self._model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            return scores, time.perf_counter() - start
+
+    def _max_pairs_before(self, deadline: float) -> int:
+        remaining = deadline - time.perf_counter() - self._overhead_seconds
+        if remaining <= 0:
+            return 0
+        return int(remaining / max(self._seconds_per_pair, 1e-6))
+
+    def rerank(self, query: str, candidates: List[Document], top_k: int,
+               deadline: Optional[float] = None) -> List[Document]:
+        """
+        Return the top_k candidates by cross-encoder score. `deadline` is a time.perf_counter() value;
+        candidates keep their first-stage order when the budget does not allow reranking.
+        """
+        return self.rerank_with_info(query, candidates, top_k, deadline)[0]
+
+    def rerank_with_info(self, query: str, candidates: List[Document], top_k: int,
+                         deadline: Optional[float] = None) -> Tuple[List[Document], dict]:
+        """
+        rerank() plus how it went: info["complete"] is False when the latency budget truncated or skipped
+        the rerank, i.e. the ordering is degraded and should not be cached.
+        """
+        if self._model is None:
+            self.warmup()
+        if len(candidates) <= 1:
+            info = {"reranked": False, "complete": True, "reason": "not enough candidates"}
+            self.last_info = info
+            return candidates[:top_k], info
+
+        truncated = False
+        if deadline is not None:
+            affordable = self._max_pairs_before(deadline)
+            if affordable < min(top_k, len(candidates)):
+                info = {"reranked": False, "complete": False, "reason": "latency budget", "affordable": affordable}
+                self.last_info = info
+                return candidates[:top_k], info
+            # Keep the best first-stage candidates that still fit in the budget
+            truncated = affordable < len(candidates)
+            candidates = candidates[:affordable]
+
+        scores, elapsed = self._predict([(query, doc.page_content) for doc in candidates])
+        per_pair = max(elapsed - self._overhead_seconds, 0.0) / len(candidates)
+        self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * per_pair
+        ranked = sorted(zip(candidates, scores), key=lambda item: float(item[1]), reverse=True)
+        info = {"reranked": True, "complete": not truncated, "candidates": len(candidates)}
+        self.last_info = info
+        return [doc for doc, _ in ranked[:top_k]], info
@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answers of previous MANUAL/GENERAL queries indexed by their query embedding.
+    A new query whose embedding has cosine similarity >= threshold with a cached query of the same
+    category gets the cached answer back. Entries are stamped with RAGStorage.corpus_version and
+    dropped as soon as the knowledge base changes.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 1000, ttl_seconds: Optional[float] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._entries: List[dict] = []
+        self._corpus_version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, corpus_version: int):
+        if corpus_version != self._corpus_version:
+            # RAG sources changed -> every cached answer may be stale
+            self._vectors = np.empty((0, 0), dtype=np.float32)
+            self._entries = []
+            self._corpus_version = corpus_version
+
+    def lookup(self, query_vector, category: str, corpus_version: int) -> Optional[str]:
+        with self._lock:
+            self._check_version(corpus_version)
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors @ self._normalize(query_vector)
+            now = time.time()
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.threshold:
+                    break
+                entry = self._entries[index]
+                if entry["category"] != category:
+                    continue
+                if self.ttl_seconds is not None and entry["created_at"] + self.ttl_seconds < now:
+                    continue
+                self.hits += 1
+                print(f"--- [Semantic Cache] Hit (similarity {similarities[index]:.3f}) "
+                      f"for: {entry['query']} ---")
+                return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, query: str, query_vector, category: str, answer: str, corpus_version: int):
+        with self._lock:
+            self._check_version(corpus_version)
+            vector = self._normalize(query_vector)[None, :]
+            if len(self._entries) >= self.max_entries:
+                # Oldest first out
+                self._vectors = self._vectors[1:]
+                self._entries = self._entries[1:]
+            self._vectors = vector if not self._entries else np.vstack([self._vectors, vector])
+            self._entries.append({
+                "query": query, "category": category, "answer": answer, "created_at": time.time()})
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
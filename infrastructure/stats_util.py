@@ -0,0 +1,10 @@
+import math
+from typing import List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    # Nearest-rank percentile
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
@@ -0,0 +1,62 @@
+from langchain_core.documents import Document
+
+from context_builder import build_context
+from metadata_filter import build_where_filter
+
+
+def _chunk(test_id: str, section: str, body: str) -> Document:
+    return Document(page_content=f"Test ID: {test_id}\n{body}",
+                    metadata={"test_id": test_id, "section": section, "source": "cases.json"})
+
+
+CHUNKS = {
+    "ae_login_flow": [
+        _chunk("ae_login_flow", "intent", "Intent Summary: log in"),
+        _chunk("ae_login_flow", "ui_elements", "UI Elements: login-email"),
+        _chunk("ae_login_flow", "test_steps", "Test Steps: fill login-email"),
+        _chunk("ae_login_flow", "validation_rules", "Validation Rules: dashboard visible"),
+        _chunk("ae_login_flow", "metadata", "Tags: auth"),
+    ],
+}
+
+
+def _siblings(test_id):
+    return CHUNKS.get(test_id, [])
+
+
+def test_hit_is_expanded_to_its_test_case_in_section_order():
+    hit = CHUNKS["ae_login_flow"][2]
+    context = build_context([hit], _siblings)
+    assert context.startswith("## Test case: ae_login_flow")
+    assert context.index("Intent Summary") < context.index("UI Elements") < context.index("Test Steps")
+    # metadata section is skipped by default, the Test ID line is carried by the header only
+    assert "Tags: auth" not in context
+    assert context.count("Test ID:") == 0
+
+
+def test_expansion_stays_inside_the_search_filter():
+    where = build_where_filter(sections=["test_steps", "ui_elements"])
+    hit = CHUNKS["ae_login_flow"][2]
+    context = build_context([hit], _siblings, where=where)
+    assert "Test Steps" in context and "UI Elements" in context
+    assert "Intent Summary" not in context
+    assert "Validation Rules" not in context
+
+
+def test_token_budget_limits_output():
+    hit = CHUNKS["ae_login_flow"][2]
+    context = build_context([hit], _siblings, token_budget=12)
+    assert context.startswith("## Test case: ae_login_flow")
+    assert "Validation Rules" not in context
+
+
+def test_plain_hits_are_rendered_once():
+    hit = Document(page_content="Checkout notes", metadata={"source": "notes.md"})
+    context = build_context([hit, hit], _siblings)
+    assert context == "## Source: notes.md\nCheckout notes"
+
+
+def test_max_test_cases():
+    other = _chunk("ae_add_to_cart", "test_steps", "Test Steps: add")
+    context = build_context([CHUNKS["ae_login_flow"][2], other], _siblings, max_test_cases=1)
+    assert "ae_add_to_cart" not in context
@@ -0,0 +1,124 @@
+import os
+
+from corpus_manifest import CorpusManifest
+
+
+def _manifest(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir(exist_ok=True)
+    return CorpusManifest(str(tmp_path / "db" / "corpus_manifest.json"), str(data_dir)), data_dir
+
+
+def test_unchanged_corpus_reports_nothing(tmp_path):
+    manifest, data_dir = _manifest(tmp_path)
+    (data_dir / "a.json").write_text("[]", encoding="utf-8")
+    (data_dir / "b.md").write_text("# B", encoding="utf-8")
+
+    changed, removed = manifest.scan()
+    assert sorted(path.name for path in changed) == ["a.json", "b.md"]
+    assert removed == []
+    manifest.commit()
+
+    reloaded, _ = _manifest(tmp_path)
+    assert reloaded.scan() == ([], [])
+
+
+def test_touched_file_with_same_content_is_not_reindexed(tmp_path):
+    manifest, data_dir = _manifest(tmp_path)
+    path = data_dir / "a.json"
+    path.write_text("[]", encoding="utf-8")
+    manifest.scan()
+    manifest.commit()
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert manifest.scan() == ([], [])
+
+
+def test_modified_and_removed_files(tmp_path):
+    manifest, data_dir = _manifest(tmp_path)
+    (data_dir / "a.json").write_text("[]", encoding="utf-8")
+    (data_dir / "b.md").write_text("# B", encoding="utf-8")
+    manifest.scan()
+    manifest.commit()
+
+    (data_dir / "a.json").write_text('[{"test_id": "x"}]', encoding="utf-8")
+    (data_dir / "b.md").unlink()
+    changed, removed = manifest.scan()
+    assert [path.name for path in changed] == ["a.json"]
+    assert removed == ["b.md"]
+
+
+def test_discarded_file_is_retried_on_next_scan(tmp_path):
+    manifest, data_dir = _manifest(tmp_path)
+    (data_dir / "a.json").write_text("[]", encoding="utf-8")
+    manifest.scan()
+    manifest.commit()
+
+    broken = data_dir / "a.json"
+    broken.write_text("[{", encoding="utf-8")
+    changed, _ = manifest.scan()
+    # Parsing failed: keep the old fingerprint so the file is not considered indexed
+    manifest.discard(changed)
+    manifest.commit()
+
+    reloaded, _ = _manifest(tmp_path)
+    changed, _ = reloaded.scan()
+    assert [path.name for path in changed] == ["a.json"]
+
+
+def test_manifest_for_another_directory_is_ignored(tmp_path):
+    manifest, data_dir = _manifest(tmp_path)
+    (data_dir / "a.json").write_text("[]", encoding="utf-8")
+    manifest.scan()
+    manifest.commit()
+
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    (other_dir / "a.json").write_text("[]", encoding="utf-8")
+    other = CorpusManifest(str(tmp_path / "db" / "corpus_manifest.json"), str(other_dir))
+    changed, _ = other.scan()
+    assert [path.name for path in changed] == ["a.json"]
+
+
+def test_same_file_name_in_two_directories(tmp_path):
+    manifest, data_dir = _manifest(tmp_path)
+    for folder in ("a", "b"):
+        (data_dir / folder).mkdir()
+        (data_dir / folder / "cases.json").write_text(f'[{{"test_id": "{folder.upper()}1"}}]', encoding="utf-8")
+    changed, removed = manifest.scan()
+    assert sorted(manifest.source(path) for path in changed) == ["a/cases.json", "b/cases.json"]
+    assert removed == ["cases.json"]  # file-name source an older index may still hold
+    manifest.commit()
+
+    # Only a/cases.json is re-indexed: b/cases.json keeps its own source and chunks
+    (data_dir / "a" / "cases.json").write_text('[{"test_id": "A2"}]', encoding="utf-8")
+    changed, removed = manifest.scan()
+    assert [manifest.source(path) for path in changed] == ["a/cases.json"]
+    assert removed == []
+    manifest.commit()
+
+    (data_dir / "a" / "cases.json").unlink()
+    assert _manifest(tmp_path)[0].scan() == ([], ["a/cases.json"])
+
+
+def test_legacy_file_name_sources_are_reported_once(tmp_path):
+    manifest, data_dir = _manifest(tmp_path)
+    (data_dir / "top.json").write_text("[]", encoding="utf-8")
+    (data_dir / "sub").mkdir()
+    (data_dir / "sub" / "nested.json").write_text("[]", encoding="utf-8")
+    (data_dir / "sub" / "broken.json").write_text("[{", encoding="utf-8")
+
+    _, removed = manifest.scan()
+    # A top-level file's relative path is its name, so only nested names are legacy
+    assert removed == ["broken.json", "nested.json"]
+    manifest.discard([data_dir / "sub" / "broken.json"])
+    manifest.commit()
+
+    # The legacy source of the file that failed to parse stays until that file is indexed
+    reloaded, _ = _manifest(tmp_path)
+    changed, removed = reloaded.scan()
+    assert [reloaded.source(path) for path in changed] == ["sub/broken.json"]
+    assert removed == ["broken.json"]
+    reloaded.commit()
+    assert _manifest(tmp_path)[0].scan() == ([], [])
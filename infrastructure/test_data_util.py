@@ -0,0 +1,64 @@
+import json
+from concurrent.futures import Future
+
+from langchain_core.documents import Document
+
+import data_util
+from data_util import stream_files
+
+
+def _write_cases(path, test_id):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps([{"test_id": test_id, "intent": {"summary": test_id}}]), encoding="utf-8")
+    return path
+
+
+def test_same_file_name_in_two_directories_gets_distinct_sources(tmp_path):
+    files = [_write_cases(tmp_path / "a" / "cases.json", "A1"), _write_cases(tmp_path / "b" / "cases.json", "B1")]
+    chunks = list(stream_files(files, max_workers=1, source_root=tmp_path))
+    sources = {chunk.metadata["test_id"]: chunk.metadata["source"] for chunk in chunks}
+    assert sources == {"A1": "a/cases.json", "B1": "b/cases.json"}
+
+
+def test_failed_files_are_reported(tmp_path):
+    good = _write_cases(tmp_path / "good.json", "G1")
+    broken = tmp_path / "broken.json"
+    broken.write_text("[{", encoding="utf-8")
+    failed = []
+    chunks = list(stream_files([broken, good], max_workers=1, failed_files=failed, source_root=tmp_path))
+    assert {chunk.metadata["source"] for chunk in chunks} == {"good.json"}
+    assert failed == [broken]
+
+
+class _RecordingPool:
+    """Synchronous stand-in for the spawned ProcessPoolExecutor."""
+    instances = []
+
+    def __init__(self, max_workers, mp_context=None):
+        self.submitted = []
+        _RecordingPool.instances.append(self)
+
+    def submit(self, fn, file_path, chunk_size, chunk_overlap, source):
+        self.submitted.append(source)
+        future = Future()
+        future.set_result([Document(page_content="pdf text", metadata={"source": source})])
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_only_unstructured_files_go_to_the_process_pool(tmp_path, monkeypatch):
+    _RecordingPool.instances = []
+    monkeypatch.setattr(data_util, "ProcessPoolExecutor", _RecordingPool)
+    text_files = [_write_cases(tmp_path / f"cases_{i}.json", f"T{i}") for i in range(4)]
+    chunks = list(stream_files(text_files, max_workers=4, source_root=tmp_path))
+    assert {chunk.metadata["test_id"] for chunk in chunks} == {"T0", "T1", "T2", "T3"}
+    # Text formats are parsed in-process: no interpreter start-up for them
+    assert _RecordingPool.instances == []
+
+    pdf = tmp_path / "guide.pdf"
+    pdf.write_bytes(b"%PDF")
+    chunks = list(stream_files(text_files[:1] + [pdf], max_workers=4, source_root=tmp_path))
+    assert [pool.submitted for pool in _RecordingPool.instances] == [["guide.pdf"]]
+    assert {chunk.metadata["source"] for chunk in chunks} == {"cases_0.json", "guide.pdf"}
@@ -0,0 +1,74 @@
+import itertools
+from types import SimpleNamespace
+
+from langchain_core.embeddings import Embeddings
+
+import embedding_cache
+from embedding_cache import CachedEmbeddings
+
+
+class _CountingEmbeddings(Embeddings):
+    """Deterministic vectors; records every text that is actually embedded."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.5]
+
+
+def _cache(tmp_path, underlying=None, model_name="minilm", **kwargs):
+    return CachedEmbeddings(underlying or _CountingEmbeddings(), model_name,
+                            cache_path=str(tmp_path / "embeddings.db"), **kwargs)
+
+
+def test_cached_texts_are_not_embedded_again(tmp_path):
+    underlying = _CountingEmbeddings()
+    cache = _cache(tmp_path, underlying)
+    first = cache.embed_documents(["alpha", "beta"])
+    second = cache.embed_documents(["beta", "gamma", "alpha"])
+    assert second == [first[1], [5.0, 0.5], first[0]]
+    assert underlying.embedded == ["alpha", "beta", "gamma"]
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_duplicates_in_one_batch_are_embedded_once(tmp_path):
+    underlying = _CountingEmbeddings()
+    cache = _cache(tmp_path, underlying)
+    assert cache.embed_documents(["same", "same"]) == [[4.0, 0.5], [4.0, 0.5]]
+    assert underlying.embedded == ["same"]
+
+
+def test_cache_persists_across_instances(tmp_path):
+    _cache(tmp_path).embed_documents(["persisted"])
+    underlying = _CountingEmbeddings()
+    assert _cache(tmp_path, underlying).embed_documents(["persisted"]) == [[9.0, 0.5]]
+    assert underlying.embedded == []
+
+
+def test_model_name_is_part_of_the_key(tmp_path):
+    _cache(tmp_path, model_name="minilm").embed_documents(["text"])
+    underlying = _CountingEmbeddings()
+    _cache(tmp_path, underlying, model_name="mpnet").embed_documents(["text"])
+    assert underlying.embedded == ["text"]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    # Strictly increasing access times, whatever the clock resolution
+    clock = itertools.count(1)
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=lambda: next(clock)))
+    cache = _cache(tmp_path, max_entries=2)
+    cache.embed_documents(["old"])
+    cache.embed_documents(["kept"])
+    cache.embed_documents(["kept"])
+    cache.embed_documents(["new"])
+    assert cache.stats()["entries"] == 2
+
+    underlying = _CountingEmbeddings()
+    reopened = _cache(tmp_path, underlying)
+    reopened.embed_documents(["kept", "new", "old"])
+    assert underlying.embedded == ["old"]
@@ -0,0 +1,87 @@
+from langchain_core.documents import Document
+
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def _index(texts: dict) -> BM25Index:
+    index = BM25Index()
+    for doc_id, text in texts.items():
+        index.add(doc_id, Document(page_content=text, metadata={"section": doc_id.split(":")[0]}))
+    return index
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    tokens = tokenize("Click #login-email on ae_login_flow")
+    assert "login-email" in tokens and "ae_login_flow" in tokens
+    assert {"login", "email", "ae", "flow"} <= set(tokens)
+
+
+def test_exact_identifier_ranks_first():
+    index = _index({
+        "steps:1": "Test ID: ae_login_flow Step 1: fill login-email",
+        "steps:2": "Test ID: ae_add_to_cart Step 1: click add-to-cart",
+        "intent:1": "Log in with valid credentials",
+    })
+    results = index.search("ae_add_to_cart", k=3)
+    assert results[0][0] == "steps:2"
+
+
+def test_remove_drops_document_from_results():
+    index = _index({"a:1": "checkout payment", "a:2": "checkout cart"})
+    index.remove("a:1")
+    assert [doc_id for doc_id, _ in index.search("payment")] == []
+    assert index.ids() == {"a:2"}
+    assert len(index) == 1
+
+
+def test_readding_a_document_replaces_it():
+    index = _index({"a:1": "checkout payment"})
+    index.add("a:1", Document(page_content="login form", metadata={}))
+    assert index.search("payment") == []
+    assert index.search("login")[0][0] == "a:1"
+
+
+def test_doc_filter_is_applied():
+    index = _index({"steps:1": "login button", "intent:1": "login intent"})
+    results = index.search("login", doc_filter=lambda doc: doc.metadata["section"] == "steps")
+    assert [doc_id for doc_id, _ in results] == ["steps:1"]
+
+
+def test_empty_index_returns_nothing():
+    assert BM25Index().search("anything") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]], k=60)
+    # b: 1/62 + 1/61, a: 1/61 + 1/63 -> b first; ids found by only one side come last
+    assert fused[:2] == ["b", "a"]
+    assert set(fused[2:]) == {"c", "d"}
+
+
+def test_reciprocal_rank_fusion_single_ranking_keeps_order():
+    assert reciprocal_rank_fusion([["x", "y", "z"]]) == ["x", "y", "z"]
+
+
+def test_ubiquitous_terms_do_not_need_a_full_scan():
+    index = _index({f"steps:{i}": f"Test ID: case_{i} click button" for i in range(50)})
+    index.add("steps:x", Document(page_content="Test ID: case_x fill #login-email", metadata={"section": "steps"}))
+    # "test"/"id" are in every chunk: skipped, the identifier decides
+    assert index.search("Which test uses #login-email?", k=1)[0][0] == "steps:x"
+    # Only ubiquitous terms: still ranked by the rarest one
+    assert len(index.search("test id", k=5)) == 5
+
+
+def test_filter_reads_past_the_postings_cut_off():
+    index = BM25Index(postings_per_result=1)
+    for i in range(20):
+        index.add(f"intent:{i}", Document(page_content="checkout", metadata={"section": "intent"}))
+    index.add("steps:1", Document(page_content="checkout flow", metadata={"section": "steps"}))
+    results = index.search("checkout", k=1, doc_filter=lambda doc: doc.metadata["section"] == "steps")
+    assert [doc_id for doc_id, _ in results] == ["steps:1"]
+
+
+def test_new_documents_are_searchable_after_a_query():
+    index = _index({"a:1": "checkout payment"})
+    index.search("checkout")
+    index.add("a:2", Document(page_content="checkout", metadata={}))
+    assert {doc_id for doc_id, _ in index.search("checkout")} == {"a:1", "a:2"}
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import lru_cache
+from lru_cache import LRUCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert len(cache) == 2
+
+
+def test_put_replaces_and_refreshes_an_entry():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = LRUCache(ttl=10)
+    cache.put("k", "v")
+    now[0] = 109.0
+    assert cache.get("k") == "v"
+    now[0] = 111.0
+    assert cache.get("k", "default") == "default"
+    assert len(cache) == 0
+
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache()
+    cache.put("falsy", 0)
+    assert cache.get("falsy", "default") == 0
+    cache.get("missing")
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+    cache.clear()
+    assert len(cache) == 0
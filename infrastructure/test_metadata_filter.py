@@ -0,0 +1,38 @@
+import pytest
+
+from metadata_filter import build_where_filter, metadata_matches
+
+CHUNK = {"section": "steps", "test_id": "ae_login_flow", "scope": "web", "step": 3}
+
+
+def test_no_filter():
+    assert build_where_filter() is None
+    assert metadata_matches(CHUNK, None)
+
+
+def test_single_clause_is_not_wrapped():
+    assert build_where_filter(scope="web") == {"scope": {"$eq": "web"}}
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"section": "steps"}, True),
+    ({"section": {"$eq": "intent"}}, False),
+    ({"section": {"$ne": "intent"}}, True),
+    ({"test_id": {"$in": ["ae_login_flow", "ae_cart"]}}, True),
+    ({"test_id": {"$nin": ["ae_login_flow"]}}, False),
+    ({"step": {"$gte": 3, "$lt": 5}}, True),
+    ({"step": {"$gt": 3}}, False),
+    ({"missing": {"$gt": 0}}, False),
+    ({"$or": [{"section": "intent"}, {"scope": "web"}]}, True),
+    ({"$or": [{"section": "intent"}, {"scope": "api"}]}, False),
+])
+def test_operators(where, expected):
+    assert metadata_matches(CHUNK, where) is expected
+
+
+def test_built_filters_match_like_chroma():
+    where = build_where_filter(sections=["steps", "intent"], test_id="ae_login_flow", scope="web")
+    assert list(where) == ["$and"]
+    assert metadata_matches(CHUNK, where)
+    assert not metadata_matches({**CHUNK, "test_id": "ae_cart"}, where)
+    assert metadata_matches(CHUNK, build_where_filter(test_id=["ae_cart", "ae_login_flow"]))
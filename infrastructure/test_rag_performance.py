@@ -1,5 +1,8 @@
+import time
 from test_rag_storage import build_vector_store, search_documents
 from data_util import load_entire_knowledge_base
+from reranker import CrossEncoderReranker
+from stats_util import percentile
 from typing import List
 from langchain_core.documents import Document
 
@@ -79,5 +82,43 @@ def test_rag_hit_rate():
 
     assert hit_rate >= 0.5, f"Hit rate {hit_rate:.2%} is below the acceptable threshold."
 
+def run_rerank_benchmark(top_k: int = 3, fetch_k: int = 20, budget_ms: float = None, repeats: int = 5):
+    """Hit rate and p50/p95 retrieval latency with and without the cross-encoder rerank stage."""
+    documents = load_entire_knowledge_base(DIR_DATA)
+    # Fresh store: the embedding cache makes the rebuild cheap, and re-adding to the store that
+    # test_rag_hit_rate() just built would duplicate every chunk (new ids on each add)
+    vectordb = build_vector_store(documents)
+    reranker = CrossEncoderReranker()
+    reranker.warmup()
+
+    report = {}
+    for label, use_rerank in (("vector", False), ("vector+rerank", True)):
+        latencies = []
+        retrieved_docs = []
+        for q in BENCHMARK_SUITE:
+            for i in range(repeats):
+                start = time.perf_counter()
+                candidates = [doc for doc, _ in search_documents(
+                    vectordb, q["query"], top_k=fetch_k if use_rerank else top_k)]
+                if use_rerank:
+                    deadline = start + budget_ms / 1000 if budget_ms else None
+                    candidates = reranker.rerank(q["query"], candidates, top_k=top_k, deadline=deadline)
+                latencies.append((time.perf_counter() - start) * 1000)
+            retrieved_docs.append(candidates)
+
+        print(f"\n===== {label} =====")
+        report[label] = {
+            "hit_rate": calculate_hit_rate(BENCHMARK_SUITE, retrieved_docs),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+        }
+
+    print("\nRERANK BENCHMARK")
+    for label, row in report.items():
+        print(f"{label:>14}: hit rate {row['hit_rate']:.2%} | p50 {row['p50_ms']:.1f} ms | p95 {row['p95_ms']:.1f} ms")
+    return report
+
+
 if __name__ == "__main__":
-    test_rag_hit_rate()
\ No newline at end of file
+    test_rag_hit_rate()
+    run_rerank_benchmark()
\ No newline at end of file
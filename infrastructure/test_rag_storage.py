@@ -4,12 +4,18 @@ from typing import List
 from langchain_community.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
+from embedding_cache import CachedEmbeddings
+from ingest_pipeline import IngestionPipeline, PrecomputedVectorStore, format_stage_stats
+
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
 
 
 def build_vector_store(
     documents: List[Document],
     persist_directory: str = "./test_chroma_db",
-    clear_existing: bool = True
+    clear_existing: bool = True,
+    embedding_cache_path: str = "./embedding_cache.db",
+    embed_batch_size: int = 64
 ):
     # 1. Clear existing database folder if requested
     if clear_existing and os.path.exists(persist_directory):
@@ -17,17 +23,32 @@ def build_vector_store(
         shutil.rmtree(persist_directory)
         print(f"🧹 Cleared existing database at {persist_directory}")
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="paraphrase-multilingual-MiniLM-L12-v2"
+    # Vectors survive the folder wipe above, only new chunk text is embedded again
+    embeddings = CachedEmbeddings(
+        HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+        model_name=EMBEDDING_MODEL,
+        cache_path=embedding_cache_path
     )
 
-    vectordb = Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
+    vectordb = Chroma(
+        embedding_function=embeddings,
         persist_directory=persist_directory,
         collection_metadata={"hnsw:space": "cosine"} # Forces 0 to 1 scoring
     )
+
+    # Embed in batches of embed_batch_size while the previous batch (and its vectors) is written to Chroma
+    destination = PrecomputedVectorStore(vectordb)
+
+    def _add_batches(batches):
+        for batch, vectors in batches:
+            destination.prime(batch, vectors)
+            destination.add_documents(batch)
+            destination.clear()
+
+    _, stage_stats = IngestionPipeline(embeddings, embed_batch_size=embed_batch_size).run(documents, _add_batches)
     print(f"✅ Successfully indexed {len(documents)} chunks.")
+    print(f"⏱️ {format_stage_stats(stage_stats)}")
+    print(f"📦 Embedding cache: {embeddings.stats()}")
     return vectordb
 
 
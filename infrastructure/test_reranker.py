@@ -0,0 +1,45 @@
+import time
+
+from langchain_core.documents import Document
+
+from reranker import CrossEncoderReranker
+
+
+class _LengthModel:
+    """Stand-in cross-encoder: longer passages score higher."""
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=False):
+        return [float(len(passage)) for _, passage in pairs]
+
+
+def _reranker(seconds_per_pair: float = 1e-5) -> CrossEncoderReranker:
+    reranker = CrossEncoderReranker()
+    reranker._model = _LengthModel()
+    reranker._overhead_seconds = 0.0
+    reranker._seconds_per_pair = seconds_per_pair
+    return reranker
+
+
+CANDIDATES = [Document(page_content="x" * length) for length in (1, 5, 3, 4, 2)]
+
+
+def test_rerank_orders_by_score_and_is_complete():
+    docs, info = _reranker().rerank_with_info("q", CANDIDATES, top_k=2)
+    assert [len(doc.page_content) for doc in docs] == [5, 4]
+    assert info["reranked"] and info["complete"]
+
+
+def test_budget_truncation_is_reported_incomplete():
+    reranker = _reranker(seconds_per_pair=0.01)
+    # Room for about 3 of the 5 pairs
+    docs, info = reranker.rerank_with_info("q", CANDIDATES, top_k=2, deadline=time.perf_counter() + 0.035)
+    assert info["reranked"] and not info["complete"]
+    assert info["candidates"] < len(CANDIDATES)
+    assert len(docs) == 2
+
+
+def test_skipped_rerank_keeps_first_stage_order():
+    reranker = _reranker(seconds_per_pair=1.0)
+    docs, info = reranker.rerank_with_info("q", CANDIDATES, top_k=2, deadline=time.perf_counter() + 0.01)
+    assert docs == CANDIDATES[:2]
+    assert not info["reranked"] and not info["complete"]
@@ -1,3 +1,5 @@
+import argparse
+import json
 import yaml
 import asyncio
 from core.llm_client import LLMClient
@@ -5,6 +7,8 @@ from core.router import PromptRouter
 from infrastructure.database import RAGStorage
 from services.mcp_service import MCPService
 from core.executor import TaskExecutor
+from core.batch import run_batch
+from core.service import AgentService
 from dotenv import load_dotenv
 
 
@@ -20,21 +24,73 @@ async def run_system():
     storage = RAGStorage()
     mcp_service = MCPService()
     ai_client = LLMClient(model_name="gpt-4o")
-    prompt_router = PromptRouter(llm_client=ai_client, router_prompt_template=prompts["router"], mcp_service=mcp_service)
+    prompt_router = PromptRouter(llm_client=ai_client, router_prompt_template=prompts["router"], mcp_service=mcp_service,
+                                 rules=prompts.get("router_rules"), embed_fn=storage.aembed_query)
+    # Compiled graph + tool bindings are built once and shared by every query
+    executor = TaskExecutor(llm_client=ai_client, all_prompts=prompts,
+                            mcp_service=mcp_service, rag_storage=storage)
     user_queries = f'Generate Playwright automation script to complete payment flow'
     # Routing (Classify)
     print(f"\n[User]: {user_queries}")
     routing_info = await prompt_router.get_routing_info(query=user_queries)
     category = routing_info['category']
     print(f"[Router]: Identify user's purpose as -> {category}")
-    executor = TaskExecutor(llm_client=ai_client, all_prompts=prompts,
-                            mcp_service=mcp_service, rag_storage=storage, routing_info=routing_info)
-    response = await executor.execute(
-        query=user_queries, 
-        routing_info=routing_info
-    )
+    try:
+        response = await executor.execute(
+            query=user_queries,
+            routing_info=routing_info
+        )
+    except Exception as e:
+        response = f"❌ Error during executing Agent: {str(e)}"
     print(f"[AI's answer]: {response}")
+    print(f"[LLM cache]: {ai_client.cache_stats()}")
+    print(f"[Router]: {prompt_router.stats()}")
+    print(f"[LLM rate limit]: {ai_client.rate_limit_stats()}")
+    await mcp_service.web_automation_service.cleanup()
+
+
+async def run_service(mode: str, concurrency: int, host: str, port: int):
+    """Long-running mode: shared RAG/browser/graph, many concurrent sessions."""
+    load_dotenv()
+    service = AgentService(prompts=load_all_prompts(), max_concurrency=concurrency)
+    try:
+        await service.start()
+        if mode == "http":
+            await service.serve_http(host=host, port=port)
+        else:
+            await service.serve_stdin()
+    finally:
+        await service.close()
+
+
+async def run_batch_mode(input_path: str, output_path: str, concurrency: int):
+    """Batch mode: every query of a JSONL file, results appended to output_path (resumable)."""
+    load_dotenv()
+    service = AgentService(prompts=load_all_prompts(), max_concurrency=concurrency)
+    try:
+        await service.start()
+        report = await run_batch(service, input_path, output_path, workers=concurrency)
+        print(f"[Batch report]: {json.dumps(report, indent=2)}")
+        print(f"[LLM cache]: {service.llm_client.cache_stats()}")
+        print(f"[Router]: {service.router.stats()}")
+    finally:
+        await service.close()
+
 
 if __name__ == "__main__":
-    asyncio.run(run_system())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", choices=["stdin", "http"],
+                        help="Run as a service: JSONL requests on stdin or POST /query on a local port")
+    parser.add_argument("--batch", help="JSONL file of queries ({\"id\": .., \"query\": ..} per line)")
+    parser.add_argument("--out", default="batch_results.jsonl", help="Output JSONL for --batch")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    if args.batch:
+        asyncio.run(run_batch_mode(args.batch, args.out, args.concurrency))
+    elif args.serve:
+        asyncio.run(run_service(args.serve, args.concurrency, args.host, args.port))
+    else:
+        asyncio.run(run_system())
     
@@ -0,0 +1,104 @@
+"""
+Scan latency of WebAutomationService._scan_current_page vs element count, on generated local HTML.
+
+- before: is_visible() + evaluate() per element (up to 2 browser round trips each, first 200 elements)
+- after:  one evaluate_all() snapshot of all candidates, matched in Python
+
+Each fixture has N interactive elements (1 in 5 hidden) and the target is the last button, so both
+scans walk the whole candidate list (capped at MAX_SCAN_ELEMENTS).
+
+Usage: python -m services.external_service.bench_scan --elements 50 200 1000 --repeats 5
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from rapidfuzz import fuzz
+
+from infrastructure.stats_util import percentile
+from services.external_service.web_automation_service import (
+    MAX_SCAN_ELEMENTS, SCAN_SELECTOR, _DESCRIBE_NODE_JS, WebAutomationService)
+
+TARGET_TEXT = "Confirm final payment"
+# Not a substring of the target, so get_by_text() finds nothing and the fallback scan runs
+SEARCH_TEXT = "Confirm payment"
+
+
+def write_fixture(directory: Path, num_elements: int) -> Path:
+    rows = []
+    for i in range(num_elements - 1):
+        hidden = ' style="display:none"' if i % 5 == 4 else ""
+        kind = i % 4
+        if kind == 0:
+            rows.append(f'<button id="btn-{i}"{hidden}>Action number {i}</button>')
+        elif kind == 1:
+            rows.append(f'<input name="field_{i}" placeholder="Field {i}" type="text"{hidden}>')
+        elif kind == 2:
+            rows.append(f'<a href="#link-{i}"{hidden}>Link {i}</a>')
+        else:
+            rows.append(f'<textarea name="notes_{i}"{hidden}></textarea>')
+    rows.append(f'<button id="pay">{TARGET_TEXT}</button>')
+    path = directory / f"fixture_{num_elements}.html"
+    path.write_text("<html><body>\n" + "\n".join(rows) + "\n</body></html>", encoding="utf-8")
+    return path
+
+
+async def scan_before(page, search_text: str, target_type: str):
+    """The per-element scan loop as it was before the snapshot (kept here only for comparison)."""
+    base_locator = page.locator(SCAN_SELECTOR)
+    count = await base_locator.count()
+    for i in range(min(count, MAX_SCAN_ELEMENTS)):
+        el = base_locator.nth(i)
+        if await el.is_visible():
+            metadata = await el.evaluate(_DESCRIBE_NODE_JS)
+            vals = [str(v).lower() for v in metadata.values() if v is not None]
+            if target_type in vals and any(fuzz.ratio(v, search_text.lower()) > 50 for v in vals):
+                return el
+    return None
+
+
+async def _time_ms(scan, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await scan()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def main(element_counts, repeats: int):
+    service = WebAutomationService(warm_sessions=0)
+    with tempfile.TemporaryDirectory(prefix="scan_bench_") as work_dir:
+        try:
+            # Leased like a real session: pooled context + page with the DOM version observer
+            page = (await service._ensure_browser())["page"]
+
+            async def scan_after():
+                # Time the snapshot scan itself, not an answer from the per-DOM-version index
+                service._invalidate_dom_index()
+                await service._scan_current_page(SEARCH_TEXT, "button")
+
+            print(f"{'elements':>8} | {'before p50 ms':>13} | {'after p50 ms':>12} | speed-up")
+            for num_elements in element_counts:
+                fixture = write_fixture(Path(work_dir), num_elements)
+                await page.goto(fixture.as_uri())
+                # Warm-up (first evaluate compiles the page script)
+                await service._scan_current_page("no such element", "button")
+
+                before = await _time_ms(lambda: scan_before(page, SEARCH_TEXT, "button"), repeats)
+                after = await _time_ms(scan_after, repeats)
+                before_p50, after_p50 = percentile(before, 50), percentile(after, 50)
+                print(f"{num_elements:>8} | {before_p50:>13.1f} | {after_p50:>12.1f} | "
+                      f"{before_p50 / max(after_p50, 1e-9):.1f}x")
+        finally:
+            await service.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--elements", nargs="+", type=int, default=[50, 200, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.elements, args.repeats))
@@ -0,0 +1,226 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/122.0.0.0 Safari/537.36"
+
+
+class BrowserContextPool:
+    """
+    Isolated browser contexts over one shared headless Chromium, leased per session.
+
+    - lease(session_id): the session's context + page (a "slot" dict), created on first use or taken
+      from the warm spares; waits while max_contexts are leased
+    - release(session_id): closes the context (cookies/storage never leak to another session)
+    - min_idle warm spares are pre-spawned so a new session does not pay the context start-up
+    - spares are health-checked before being handed out; a crashed browser is relaunched
+    - sessions idle for idle_timeout seconds are reaped in the background
+    `setup(slot)` runs once per new slot, after its page is created (init scripts, bindings, listeners).
+    A slot holds "context", "page", "lock" (per-session asyncio.Lock) and "last_used".
+    """
+
+    def __init__(self, max_contexts: int = 8, min_idle: int = 1, idle_timeout: float = 300.0,
+                 reap_interval: float = 30.0, headless: bool = True,
+                 setup: Callable[[dict], Awaitable[None]] = None):
+        self.max_contexts = max_contexts
+        self.min_idle = min_idle
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self.headless = headless
+        self.setup = setup
+        self.leases: Dict[str, dict] = {}
+        self.metrics = {"leased": 0, "warm_hits": 0, "created": 0, "reaped": 0, "unhealthy": 0, "waits": 0}
+        self._idle: List[dict] = []
+        self._pending = 0
+        self._playwright = None
+        self._browser = None
+        self._condition = asyncio.Condition()
+        self._launch_lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+        self._refill: Optional[asyncio.Task] = None
+
+    @property
+    def browser(self):
+        return self._browser
+
+    def _size(self) -> int:
+        return len(self.leases) + len(self._idle) + self._pending
+
+    async def start(self):
+        """Launch the browser, pre-spawn the warm spares and start the idle reaper (idempotent)."""
+        await self._ensure_browser()
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop())
+        await self._top_up()
+
+    def _browser_alive(self) -> bool:
+        return bool(self._browser and self._browser.is_connected())
+
+    async def _ensure_browser(self):
+        async with self._launch_lock:
+            if self._browser_alive():
+                return
+            if self._browser:
+                # Browser crashed: every context died with it
+                self.metrics["unhealthy"] += len(self._idle) + len(self.leases)
+                self._idle.clear()
+                self.leases.clear()
+                # Their capacity is free again: wake every waiting lease()
+                async with self._condition:
+                    self._condition.notify_all()
+            if not self._playwright:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            print(f"--- [Browser Pool] Chromium launched (headless={self.headless}) ---")
+
+    async def _new_slot(self) -> dict:
+        """New context + page. Callers reserve the capacity (_pending) while this runs."""
+        await self._ensure_browser()
+        context = await self._browser.new_context(ignore_https_errors=True, user_agent=USER_AGENT)
+        slot = {"context": context, "page": await context.new_page(), "lock": asyncio.Lock(),
+                "last_used": time.monotonic()}
+        if self.setup:
+            await self.setup(slot)
+        self.metrics["created"] += 1
+        return slot
+
+    async def _healthy(self, slot: dict) -> bool:
+        try:
+            if slot["page"].is_closed():
+                return False
+            await asyncio.wait_for(slot["page"].evaluate("1"), timeout=2)
+            return True
+        except Exception:
+            return False
+
+    async def _close_slot(self, slot: dict):
+        try:
+            await slot["context"].close()
+        except Exception:
+            pass
+
+    async def lease(self, session_id: str) -> dict:
+        slot = self.leases.get(session_id)
+        if slot is not None and self._browser_alive():
+            slot["last_used"] = time.monotonic()
+            return slot
+        if not self._browser_alive() or self._reaper is None:
+            await self.start()
+
+        while True:
+            async with self._condition:
+                while True:
+                    if session_id in self.leases:
+                        # Another coroutine of the same session leased it while we waited
+                        return self.leases[session_id]
+                    if self._idle or self._size() < self.max_contexts:
+                        break
+                    self.metrics["waits"] += 1
+                    await self._condition.wait()
+                spare = self._idle.pop() if self._idle else None
+                # Reserve the capacity (still counted against max_contexts) while the spare is health
+                # checked or a new context is created outside the condition, so release() never waits
+                self._pending += 1
+
+            if spare is not None:
+                try:
+                    healthy = await self._healthy(spare)
+                finally:
+                    self._pending -= 1
+                if healthy:
+                    self.metrics["warm_hits"] += 1
+                    return await self._assign_or_keep(session_id, spare)
+                self.metrics["unhealthy"] += 1
+                await self._close_slot(spare)
+                await self._notify()
+                continue
+
+            try:
+                slot = await self._new_slot()
+            except Exception:
+                await self._notify()
+                raise
+            finally:
+                self._pending -= 1
+            return await self._assign_or_keep(session_id, slot)
+
+    async def _assign_or_keep(self, session_id: str, slot: dict) -> dict:
+        if session_id in self.leases:
+            # Lost a race with the same session: keep the context as a warm spare
+            self._idle.append(slot)
+            await self._notify()
+            return self.leases[session_id]
+        return self._assign(session_id, slot)
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify()
+
+    def _assign(self, session_id: str, slot: dict) -> dict:
+        slot["last_used"] = time.monotonic()
+        self.leases[session_id] = slot
+        self.metrics["leased"] += 1
+        self._schedule_top_up()
+        return slot
+
+    async def release(self, session_id: str):
+        slot = self.leases.pop(session_id, None)
+        if slot is None:
+            return
+        async with slot["lock"]:
+            # Waits for a running tool call of this session to finish
+            await self._close_slot(slot)
+        await self._notify()
+        self._schedule_top_up()
+
+    def _schedule_top_up(self):
+        if self._refill is None or self._refill.done():
+            self._refill = asyncio.create_task(self._top_up())
+
+    async def _top_up(self):
+        """Keep min_idle warm spares while there is capacity."""
+        try:
+            while len(self._idle) < self.min_idle and self._size() < self.max_contexts:
+                self._pending += 1
+                try:
+                    slot = await self._new_slot()
+                finally:
+                    self._pending -= 1
+                self._idle.append(slot)
+                await self._notify()
+        except Exception as e:
+            print(f"--- [Browser Pool] Warm-up failed: {e} ---")
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            now = time.monotonic()
+            for session_id, slot in list(self.leases.items()):
+                if not slot["lock"].locked() and now - slot["last_used"] > self.idle_timeout:
+                    self.metrics["reaped"] += 1
+                    print(f"--- [Browser Pool] Reaping idle session {session_id} ---")
+                    await self.release(session_id)
+
+    def stats(self) -> dict:
+        return {**self.metrics, "active": len(self.leases), "idle": len(self._idle), "max": self.max_contexts}
+
+    async def close(self):
+        for task in (self._reaper, self._refill):
+            if task and not task.done():
+                task.cancel()
+        for slot in list(self.leases.values()) + self._idle:
+            await self._close_slot(slot)
+        self.leases.clear()
+        self._idle.clear()
+        try:
+            if self._browser:
+                await self._browser.close()
+            if self._playwright:
+                await self._playwright.stop()
+        except Exception:
+            pass
+        finally:
+            self._browser = None
+            self._playwright = None
@@ -0,0 +1,112 @@
+import asyncio
+
+from services.external_service.web_automation_service import WebAutomationService
+from services.session_context import current_session_id
+
+
+def _element(index, tag, text="", **attributes):
+    return {"index": index, "tag": tag, "id": attributes.get("id"), "name": attributes.get("name"),
+            "placeholder": attributes.get("placeholder"), "role": attributes.get("role"), "text": text,
+            "type": attributes.get("type")}
+
+
+SNAPSHOT = [
+    _element(0, "a", "Confirm payment terms"),
+    _element(3, "button", "Confirm final payment", id="pay"),
+    _element(4, "input", placeholder="Email address", name="email", type="email"),
+    _element(7, "button", "Cancel"),
+]
+
+
+def test_best_match_of_the_target_type_comes_first():
+    ranked = WebAutomationService._rank_snapshot(SNAPSHOT, "Confirm payment", "button")
+    assert [element["index"] for element in ranked] == [3]
+    assert ranked[0]["matched_attribute"] == "text"
+    assert ranked[0]["playwright_hint"] == "get_by_text('Confirm final payment')"
+
+
+def test_any_type_ranks_every_element_best_first():
+    ranked = WebAutomationService._rank_snapshot(SNAPSHOT, "Confirm payment", "any")
+    assert [element["index"] for element in ranked][:2] == [0, 3]
+    assert ranked[0]["score"] >= ranked[1]["score"]
+
+
+def test_element_scores_its_best_attribute():
+    ranked = WebAutomationService._rank_snapshot(SNAPSHOT, "email", "input")
+    assert ranked[0]["index"] == 4
+    assert (ranked[0]["matched_attribute"], ranked[0]["score"]) == ("name", 100.0)
+    assert ranked[0]["playwright_hint"] == "locator('input')"
+
+
+def test_ties_keep_dom_order_and_top_k_is_applied():
+    snapshot = [_element(i, "button", "Save") for i in range(6)]
+    ranked = WebAutomationService._rank_snapshot(snapshot, "save", "button", top_k=3)
+    assert [element["index"] for element in ranked] == [0, 1, 2]
+
+
+def test_nothing_above_the_cutoff():
+    assert WebAutomationService._rank_snapshot(SNAPSHOT, "zzzz", "any") == []
+    assert WebAutomationService._rank_snapshot(SNAPSHOT, "", "any") == []
+    assert WebAutomationService._rank_snapshot(SNAPSHOT, "Cancel", "textarea") == []
+
+
+class _FakeLocator:
+    def __init__(self, page, index=None):
+        self.page, self.index = page, index
+
+    async def count(self):
+        # get_by_text() finds nothing, so the snapshot scan resolves the target
+        return 0 if self.index is None else 1
+
+    async def evaluate_all(self, script, limit):
+        self.page.snapshots += 1
+        return self.page.elements
+
+    def nth(self, index):
+        return _FakeLocator(self.page, index)
+
+    async def is_visible(self, timeout=None):
+        return True
+
+    async def fill(self, value):
+        # Sets the value property: no DOM mutation, the observer stays silent
+        self.page.filled.append((self.page.elements[self.index]["name"], value))
+
+
+class _FakePage:
+    url = "https://shop.example.com/register"
+
+    def __init__(self, fields):
+        self.elements = [_element(i, "input", name=name, placeholder=name.title(), type="text")
+                         for i, name in enumerate(fields)]
+        self.snapshots = 0
+        self.filled = []
+
+    def get_by_text(self, text, exact=False):
+        return _FakeLocator(self)
+
+    def locator(self, selector):
+        return _FakeLocator(self)
+
+    async def evaluate(self, script):
+        return 0  # window.__domVersion
+
+    async def wait_for_timeout(self, ms):
+        pass
+
+
+def test_filling_a_form_reuses_the_page_index():
+    fields = ["email", "password", "firstname", "lastname", "phone"]
+    service = WebAutomationService()
+    page = _FakePage(fields)
+    service.pool.leases[current_session_id.get()] = {"page": page, "dom_version": 0}
+
+    async def fill_form():
+        for field in fields + ["email"]:
+            await service._get_dom_selectors("fill", f"{field} input", value=f"my {field}")
+
+    asyncio.run(fill_form())
+    assert page.filled == [(field, f"my {field}") for field in fields + ["email"]]
+    # One page snapshot for the whole form; the repeated field is answered from the index
+    assert page.snapshots == 1
+    assert (service.dom_index_hits, service.dom_index_misses) == (1, 5)
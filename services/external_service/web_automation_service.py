@@ -1,11 +1,62 @@
 import asyncio
+import time
 from enum import Enum
 import json
 import re
 from pydantic import BaseModel, Field
 from typing import Optional, Union
-from playwright.async_api import async_playwright
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+
+from services.external_service.browser_pool import BrowserContextPool
+from services.session_context import current_session_id
+
+
+# Interactive elements considered by the fallback scan, and how many of them (in DOM order)
+SCAN_SELECTOR = "button, input, select, textarea, a"
+MAX_SCAN_ELEMENTS = 200
+# Attributes fuzzily compared with the target text (tag/role/type only decide the element type)
+MATCH_ATTRIBUTES = ("text", "placeholder", "name", "id")
+MATCH_SCORE_CUTOFF = 50
+MATCH_TOP_K = 5
+
+# Metadata of one element; shared by the single-element lookup and the page snapshot
+_DESCRIBE_NODE_JS = """(node) => ({
+    tag: node.tagName.toLowerCase(),
+    id: node.id || null,
+    name: node.getAttribute('name') || null,
+    placeholder: node.getAttribute('placeholder') || node.placeholder || null,
+    role: node.getAttribute('role') || null,
+    // textContent can get complex text that innerText can miss
+    text: (node.textContent || "").replace(/\\s+/g, ' ').trim().substring(0, 50),
+    type: node.getAttribute('type') || null
+})"""
+
+# One round trip for the whole page: visible candidates only, with their index in the locator
+_SNAPSHOT_JS = """(nodes, limit) => {
+    const describe = %s;
+    const snapshot = [];
+    nodes.slice(0, limit).forEach((node, index) => {
+        // Same rule as Playwright's isVisible(): non-empty box and not visibility:hidden
+        const rect = node.getBoundingClientRect();
+        if (rect.width > 0 && rect.height > 0 && window.getComputedStyle(node).visibility !== 'hidden') {
+            snapshot.push({index: index, ...describe(node)});
+        }
+    });
+    return snapshot;
+}""" % _DESCRIBE_NODE_JS
+
+
+# Injected in every document of a session: counts DOM mutations and pushes the counter to Python
+# (binding __reportDomVersion), so a cached page index is known stale without querying the browser
+_DOM_VERSION_JS = """(() => {
+    if (window.__domVersion !== undefined) return;
+    window.__domVersion = 0;
+    // Observer callbacks are already batched: one report per task that mutated the DOM
+    new MutationObserver(() => {
+        window.__domVersion += 1;
+        if (window.__reportDomVersion) window.__reportDomVersion(window.__domVersion);
+    }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+})();"""
 
 
 class LocatorType(Enum):
@@ -32,177 +83,289 @@ class WebScannerInput(BaseModel):
 
 
 class WebAutomationService:
-    def __init__(self):
-        self._playwright = None
-        self.browser = None
-        self.page = None
-        self._lock = asyncio.Lock()
-
-    async def _ensure_browser(self):
-        """Init brower (Singleton)"""
-        async with self._lock:
-            if not self.browser:
-                self._playwright = await async_playwright().start()
-                self.browser = await self._playwright.chromium.launch(
-                    headless=False,
-                    slow_mo=1000)
-                self.context = await self.browser.new_context(
-                    ignore_https_errors=True,
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0 Safari/537.36"
-                )
-                self.page = await self.context.new_page()
-                print(f"Service ID: {id(self)}")
+    def __init__(self, max_sessions: int = 8, warm_sessions: int = 1, idle_timeout: float = 300.0,
+                 headless: bool = True):
+        """
+        One shared headless Chromium; every session (services/session_context.py) leases its own
+        isolated context + page from the pool, so sessions scan and act on pages in parallel.
+        """
+        self.pool = BrowserContextPool(max_contexts=max_sessions, min_idle=warm_sessions,
+                                       idle_timeout=idle_timeout, headless=headless, setup=self._setup_session)
+        # Scans answered from the per-(URL, DOM version) index vs scans that queried the page (one count per scan)
+        self.dom_index_hits = 0
+        self.dom_index_misses = 0
+
+    def _session(self) -> dict:
+        return self.pool.leases.get(current_session_id.get())
+
+    @property
+    def browser(self):
+        return self.pool.browser
+
+    @property
+    def page(self):
+        session = self._session()
+        return session.get("page") if session else None
+
+    @property
+    def context(self):
+        session = self._session()
+        return session.get("context") if session else None
+
+    async def _ensure_browser(self) -> dict:
+        """Lease (or reuse) the current session's context + page; launches the shared browser on first use."""
+        return await self.pool.lease(current_session_id.get())
+
+    async def warmup(self):
+        """Launch the browser and pre-spawn the warm contexts before the first request."""
+        await self.pool.start()
+
+    def stats(self) -> dict:
+        return {**self.pool.stats(), "dom_index_hits": self.dom_index_hits,
+                "dom_index_misses": self.dom_index_misses}
 
     async def get_dom_selectors(self, action: str = None, target: any = None, value: str = None, url_override: str = None) -> str:
-        async with self._lock:
-            await self._internal_ensure_browser()
-            actual_target = target
-            target_type = "any"
-            target_element = None
-            actual_url = self.page.url if self.page else url_override
-            try:
-                if url_override and (url_override not in actual_url):
-                    # If having a new URL, navigate to this new one
-                    await self.page.goto(url_override)
-                    await self.page.wait_for_load_state("networkidle")
-                actual_url = self.page.url
-                if target:
-                    for locator_type in LocatorType:
-                        if locator_type.name.lower() in target:
-                            target_type = locator_type.value
-                            break
-                    if target_type == LocatorType.LINK:
-                        actual_target = "".join(self._parse_target(
-                            target=target).rsplit(target_type, 1))
-                    else:
-                        actual_target = self._parse_target(
-                            target=target).split(target_type)[0].strip()
-
-                    target_element, meta_data = await self._scan_current_page(actual_target, target_type)
-
-                    if isinstance(action, dict):
-                        action = action["description"]
-                    target_element_count = await target_element.count() if target_element else 0
-                    if target_element_count == 1:
-                        if action and actual_target:
-                            # Check if target exist at the current page
-                            if target_element:
-                                if await target_element.is_visible(timeout=5000):
-                                    try:
-                                        if action == "click":
-                                            await target_element.click()
-                                            await self.page.wait_for_load_state("networkidle", timeout=5000)
-                                        elif action == "fill":
-                                            await target_element.fill(str(value))
-                                            await self.page.wait_for_timeout(1000)
-                                        elif action == "select":
-                                            await target_element.select_option(str(value))
-                                            await self.page.wait_for_timeout(1000)
-                                        actual_url = self.page.url
+        session = await self._ensure_browser()
+        # Per-session lock: only calls of the same session wait for each other
+        async with session["lock"]:
+            session["last_used"] = time.monotonic()
+            return await self._get_dom_selectors(action, target, value, url_override)
+
+    async def _get_dom_selectors(self, action: str = None, target: any = None, value: str = None, url_override: str = None) -> str:
+        actual_target = target
+        target_type = "any"
+        target_element = None
+        actual_url = self.page.url if self.page else url_override
+        try:
+            if url_override and (url_override not in actual_url):
+                # If having a new URL, navigate to this new one
+                await self.page.goto(url_override)
+                await self.page.wait_for_load_state("networkidle")
+            actual_url = self.page.url
+            if target:
+                for locator_type in LocatorType:
+                    if locator_type.name.lower() in target:
+                        target_type = locator_type.value
+                        break
+                if target_type == LocatorType.LINK:
+                    actual_target = "".join(self._parse_target(
+                        target=target).rsplit(target_type, 1))
+                else:
+                    actual_target = self._parse_target(
+                        target=target).split(target_type)[0].strip()
+
+                target_element, meta_data = await self._scan_current_page(actual_target, target_type)
+
+                if isinstance(action, dict):
+                    action = action["description"]
+                target_element_count = await target_element.count() if target_element else 0
+                if target_element_count == 1:
+                    if action and actual_target:
+                        # Check if target exist at the current page
+                        if target_element:
+                            if await target_element.is_visible(timeout=5000):
+                                try:
+                                    if action == "click":
+                                        await target_element.click()
+                                        await self.page.wait_for_load_state("networkidle", timeout=5000)
+                                    elif action == "fill":
+                                        await target_element.fill(str(value))
+                                        await self.page.wait_for_timeout(1000)
+                                    elif action == "select":
+                                        await target_element.select_option(str(value))
                                         await self.page.wait_for_timeout(1000)
-                                    except Exception as e:
-                                        return f"⚠️ The selector '{actual_target}' found but unable to perform {action}. Error: {str(e)}"
-                                else:
-                                    return json.dumps({
-                                        "error": f"Selector from RAG '{actual_target}' not visible at the current page.",
-                                        "url": actual_url,
-                                    }, ensure_ascii=False)
-                    else:
-                        return json.dumps({
-                            "error": f"Selector from RAG '{actual_target}'not found at the current page. You decide a locator with text approximately matches with value '{actual_target}'",
-                            "url": actual_url,
-                            "meta_data": meta_data
-                        }, indent=2, ensure_ascii=False)
-            except Exception as e:
-                if "net::ERR_ABORTED" in str(e):
-                    print(
-                        f"--- [System] Error ERR_ABORTED at {actual_url}, trying... ---")
-                    await asyncio.sleep(1)
-                    try:
-                        await self.page.goto(actual_url, wait_until="load", timeout=20000)
-                        return await self.get_dom_selectors(url_override=actual_url)
-                    except:
-                        return f"❌ Error: Unable to load {actual_url} after retry."
+                                    # Staleness is decided by the DOM observer / navigation, not by the
+                                    # action itself (fill() only sets .value): a form keeps its index
+                                    await self._sync_dom_version()
+                                    actual_url = self.page.url
+                                    await self.page.wait_for_timeout(1000)
+                                except Exception as e:
+                                    return f"⚠️ The selector '{actual_target}' found but unable to perform {action}. Error: {str(e)}"
+                            else:
+                                return json.dumps({
+                                    "error": f"Selector from RAG '{actual_target}' not visible at the current page.",
+                                    "url": actual_url,
+                                }, ensure_ascii=False)
                 else:
                     return json.dumps({
-                        "error": f"Unable to interact with alternative selector for {actual_target} from available selectors. No need to repeat.",
+                        "error": f"Selector from RAG '{actual_target}'not found at the current page. You decide a locator with text approximately matches with value '{actual_target}'",
                         "url": actual_url,
                         "meta_data": meta_data
                     }, indent=2, ensure_ascii=False)
+        except Exception as e:
+            if "net::ERR_ABORTED" in str(e):
+                print(
+                    f"--- [System] Error ERR_ABORTED at {actual_url}, trying... ---")
+                await asyncio.sleep(1)
+                try:
+                    await self.page.goto(actual_url, wait_until="load", timeout=20000)
+                    return await self._get_dom_selectors(url_override=actual_url)
+                except:
+                    return f"❌ Error: Unable to load {actual_url} after retry."
+            else:
+                return json.dumps({
+                    "error": f"Unable to interact with alternative selector for {actual_target} from available selectors. No need to repeat.",
+                    "url": actual_url,
+                    "meta_data": meta_data
+                }, indent=2, ensure_ascii=False)
 
-    async def _internal_ensure_browser(self):
-        if not self.browser:
-            from playwright.async_api import async_playwright
-            self._playwright = await async_playwright().start()
-            self.browser = await self._playwright.chromium.launch(headless=False)
-            self.context = await self.browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/122.0.0.0 Safari/537.36"
-            )
-            self.page = await self.context.new_page()
+    async def _setup_session(self, slot: dict):
+        """Pool hook for every new context: DOM version observer + main-frame navigation listener."""
+        slot["dom_version"] = 0
+        await slot["context"].expose_binding(
+            "__reportDomVersion", lambda source, version: self._on_dom_changed(slot, source, version))
+        await slot["context"].add_init_script(_DOM_VERSION_JS)
+        slot["page"].on("framenavigated", lambda frame: self._on_navigated(slot, frame))
+
+    @staticmethod
+    def _on_dom_changed(session: dict, source: dict, version: int):
+        if source["frame"] == source["page"].main_frame:
+            session["dom_version"] = version
+
+    @staticmethod
+    def _on_navigated(session: dict, frame):
+        if frame == frame.page.main_frame:
+            # New document (or history navigation): counter restarts, cached index is dropped
+            session["dom_version"] = 0
+            session.pop("dom_index", None)
+
+    async def _sync_dom_version(self):
+        """
+        Read the page's DOM version after an action, so a mutation it caused counts even if the
+        observer's report has not arrived yet.
+        """
+        session = self._session()
+        if not session or "dom_version" not in session:
+            return
+        try:
+            session["dom_version"] = await self.page.evaluate("window.__domVersion || 0")
+        except Exception:
+            # Page busy or navigating: do not trust the index
+            session.pop("dom_index", None)
+
+    def _invalidate_dom_index(self):
+        """Drop the current session's index (the next scan re-reads the page)."""
+        session = self._session()
+        if session:
+            session.pop("dom_index", None)
+
+    def _dom_index(self, create: bool = False) -> Optional[dict]:
+        """
+        Scan index of the current (URL, DOM version): the page snapshot and the resolved scans of this
+        document state. With create, a missing or stale entry is replaced by an empty one.
+        """
+        session = self._session()
+        if not session or "dom_version" not in session:
+            return None
+        key = (self.page.url, session["dom_version"])
+        index = session.get("dom_index")
+        if index is None or index["key"] != key:
+            if not create:
+                return None
+            # Keyed before the scan: a mutation during the scan makes the entry stale, not wrong
+            index = session["dom_index"] = {"key": key, "snapshot": None, "resolved": {}}
+        return index
+
+    async def _page_snapshot(self, base_locator, index: Optional[dict] = None) -> list:
+        if index is not None and index["snapshot"] is not None:
+            return index["snapshot"]
+        snapshot = await base_locator.evaluate_all(_SNAPSHOT_JS, MAX_SCAN_ELEMENTS)
+        if index is not None:
+            index["snapshot"] = snapshot
+        return snapshot
+
+    async def close_session(self, session_id: str = None):
+        """Return a session's context (default: the current one) to the pool; the browser stays up."""
+        await self.pool.release(session_id or current_session_id.get())
 
     async def _scan_current_page(self, search_text: str = None, suggested_target_type: str = "any") -> list:
-        found_flag = False
-        results = []
         if not self.page:
             return []
 
         try:
-            if search_text:
-                base_locator = self.page.get_by_text(search_text, exact=False)
-            count = await base_locator.count()
-            if(count == 1):
-                single_metadata = await base_locator.evaluate("""(node) => {
-                        return {
-                            tag: node.tagName.toLowerCase(),
-                            id: node.id || null,
-                            name: node.getAttribute('name') || null,
-                            placeholder: node.getAttribute('placeholder') || node.placeholder || null,
-                            role: node.getAttribute('role') || null,
-                            // textContent can get complex text that innerText can miss
-                            text: (node.textContent || "").replace(/\\s+/g, ' ').trim().substring(0, 50),
-                            type: node.getAttribute('type') || null
-                        };
-                    }""")
-                results.append(single_metadata)
-                for m in single_metadata.values():
-                    if suggested_target_type == m:
-                        return base_locator, results
-
-            if count < 1 or found_flag == False:
-                base_locator = self.page.locator("button, input, select, textarea, a")
-                count = await base_locator.count()
-
-            for i in range(min(count, 200)):
-                el = base_locator.nth(i)
-                if await el.is_visible():
-                    metadata = await el.evaluate("""(node) => {
-                        return {
-                            tag: node.tagName.toLowerCase(),
-                            id: node.id || null,
-                            name: node.getAttribute('name') || null,
-                            placeholder: node.getAttribute('placeholder') || node.placeholder || null,
-                            role: node.getAttribute('role') || null,
-                            // textContent can get complex text that innerText can miss
-                            text: (node.textContent || "").replace(/\\s+/g, ' ').trim().substring(0, 50),
-                            type: node.getAttribute('type') || null
-                        };
-                    }""")
-                    metadata["playwright_hint"] = f"get_by_text('{metadata['text']}')" if metadata[
-                        'text'] else f"locator('{metadata['tag']}')"
-                    vals = [str(v).lower()
-                            for v in metadata.values() if v is not None]
-                    if (match := next((v for v in vals if v.lower() == suggested_target_type.lower()), None)) and \
-                            (fuzz_match := next((v for v in vals if fuzz.ratio(v.lower(), search_text.lower()) > 50), None)):
-                        print(
-                            f"ratio is: {fuzz.ratio(fuzz_match.lower(), search_text.lower())}")
-                        selector = el
-                        results.append(metadata)
-                        return selector, results
-            return None, []
+            # Same search on an unchanged page: the scan is answered from the index without querying
+            # the page (the caller still checks count/visibility of the element before acting on it)
+            index = self._dom_index(create=True)
+            resolved_key = (search_text, suggested_target_type)
+            if index is not None and resolved_key in index["resolved"]:
+                self.dom_index_hits += 1
+                return index["resolved"][resolved_key]
+            self.dom_index_misses += 1
+            resolved = await self._resolve_target(search_text, suggested_target_type, index)
+            if index is not None:
+                index["resolved"][resolved_key] = resolved
+            return resolved
         except Exception as e:
             print(f"--- [Hybrid Scan Error] {str(e)} ---")
             return []
 
+    async def _resolve_target(self, search_text: str, suggested_target_type: str, index: Optional[dict]):
+        found_flag = False
+        results = []
+        if search_text:
+            base_locator = self.page.get_by_text(search_text, exact=False)
+        count = await base_locator.count()
+        if(count == 1):
+            single_metadata = await base_locator.evaluate(_DESCRIBE_NODE_JS)
+            results.append(single_metadata)
+            for m in single_metadata.values():
+                if suggested_target_type == m:
+                    return base_locator, results
+
+        if count < 1 or found_flag == False:
+            base_locator = self.page.locator(SCAN_SELECTOR)
+            # Single page script instead of is_visible() + evaluate() per element; reused by the other
+            # searches on the same document state
+            snapshot = await self._page_snapshot(base_locator, index)
+            ranked = self._rank_snapshot(snapshot, search_text, suggested_target_type)
+            if ranked:
+                # Best match is acted on; the runners-up are reported with their scores
+                results.extend(ranked)
+                return base_locator.nth(ranked[0]["index"]), results
+        return None, []
+
+    @staticmethod
+    def _rank_snapshot(snapshot: list, search_text: str, suggested_target_type: str,
+                       top_k: int = MATCH_TOP_K, score_cutoff: float = MATCH_SCORE_CUTOFF) -> list:
+        """
+        Top-k snapshot elements for search_text, best first. Candidates must have the target type among
+        their values ("any" accepts every element). All their MATCH_ATTRIBUTES values are scored in one
+        rapidfuzz call; an element scores its best attribute, ties keep DOM order.
+        Each result is the element metadata plus "score" and "matched_attribute".
+        """
+        target_type = (suggested_target_type or "any").lower()
+        choices, owners = [], []
+        for position, metadata in enumerate(snapshot):
+            if target_type != LocatorType.ANY.value and \
+                    target_type not in (str(v).lower() for k, v in metadata.items() if v is not None and k != "index"):
+                continue
+            for attribute in MATCH_ATTRIBUTES:
+                if metadata.get(attribute):
+                    choices.append(str(metadata[attribute]).lower())
+                    owners.append((position, attribute))
+        if not choices or not search_text:
+            return []
+
+        best = {}
+        for _, score, choice_index in process.extract(
+                search_text.lower(), choices, scorer=fuzz.ratio, processor=None,
+                score_cutoff=score_cutoff, limit=None):
+            position, attribute = owners[choice_index]
+            if position not in best or score > best[position][0]:
+                best[position] = (score, attribute)
+
+        ranked = []
+        for position, (score, attribute) in sorted(best.items(), key=lambda item: (-item[1][0], item[0]))[:top_k]:
+            metadata = dict(snapshot[position])
+            metadata["playwright_hint"] = f"get_by_text('{metadata['text']}')" if metadata[
+                'text'] else f"locator('{metadata['tag']}')"
+            metadata["score"] = round(score, 1)
+            metadata["matched_attribute"] = attribute
+            ranked.append(metadata)
+        if ranked:
+            print(f"ratio is: {ranked[0]['score']} ({ranked[0]['matched_attribute']})")
+        return ranked
+
     def _parse_target(self, target: any) -> str:
         if not target:
             return ""
@@ -229,24 +392,5 @@ class WebAutomationService:
             return target_str
 
     async def cleanup(self):
-        async with self._lock:
-            if not self.browser:
-                return
-
         # Shield help protect browser close not aborted by loop
-            async def _close():
-                try:
-                    if self.page:
-                        await self.page.close()
-                    if self.browser:
-                        await self.browser.close()
-                    if self._playwright:
-                        await self._playwright.stop()
-                except:
-                    pass
-                finally:
-                    self.page = None
-                    self.browser = None
-                    self._playwright = None
-
-            await asyncio.shield(_close())
+        await asyncio.shield(self.pool.close())
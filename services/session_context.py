@@ -0,0 +1,5 @@
+from contextvars import ContextVar
+
+# Session whose request runs in the current asyncio task. Set per request by core/service.py;
+# LangGraph copies the context into node/tool tasks, so tools see the caller's session.
+current_session_id: ContextVar[str] = ContextVar("current_session_id", default="default")